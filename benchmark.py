@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks the processing of ISTQB documents written with the LaTeX+Markdown template.
+
+"""
+
+from argparse import ArgumentParser, Namespace
+from contextlib import contextmanager
+from itertools import chain
+import json
+import logging
+import os
+from pathlib import Path
+import re
+import shutil
+import subprocess
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+import template
+
+
+IMPORT_TIME_REGEXP = re.compile(r'import time:\s*(?P<self>\d+)\s*\|\s*(?P<cumulative>\d+)\s*\|\s*(?P<module>\S+)')
+LAZILY_IMPORTED_MODULES = ['git', 'yamale', 'yaml']
+REPOSITORY_PATHS = [
+    'CURRENT_DIRECTORY', 'ROOT_COPY_DIRECTORY', 'EXAMPLE_DOCUMENT', 'CACHE_DIRECTORY', 'VALIDATION_CACHE', 'BUILD_HISTORY', 'EPS_MANIFEST',
+    'XLSX_MANIFEST', 'QUESTIONS_CACHE', 'SERVER_SOCKET', 'FORMAT_DIRECTORY',
+]
+
+
+def _measure(
+    fn: Callable[[], object],
+    repetitions: int,
+    setup: Optional[Callable[[], object]] = None,
+) -> Dict[str, Union[int, float]]:
+    durations = []
+    for _ in range(repetitions):
+        if setup is not None:
+            setup()
+        start_time = perf_counter()
+        fn()
+        durations.append(perf_counter() - start_time)
+    return {
+        'repetitions': repetitions,
+        'min_seconds': min(durations),
+        'mean_seconds': sum(durations) / len(durations),
+    }
+
+
+def _print_results(results: Dict) -> None:
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+
+def benchmark_check_yaml(args: Namespace) -> None:
+    paths: List[Path] = sorted(map(Path, args.filenames)) if args.filenames else sorted(template._find_files(['all-yaml']))
+    paths = [path.resolve() for path in paths]
+
+    def check_yaml_files_one_by_one():
+        for path in paths:
+            template._check_yaml_files([path])
+
+    def check_yaml_files_in_batch():
+        template._check_yaml_files(paths)
+
+    _print_results({
+        'benchmark': 'check-yaml',
+        'number_of_files': len(paths),
+        'results': {
+            'one-process-per-file': _measure(check_yaml_files_one_by_one, args.repetitions),
+            'one-batched-process': _measure(check_yaml_files_in_batch, args.repetitions),
+        },
+    })
+
+
+def _clear_caches() -> None:
+    for value in vars(template).values():
+        if not isinstance(value, type) and callable(getattr(value, 'cache_clear', None)):
+            value.cache_clear()
+
+
+@contextmanager
+def _use_repository(root: Path) -> Iterator[None]:
+    # Besides changing the current directory, move the paths that template.py derived from it at import time, such as its caches.
+    original_path = os.getcwd()
+    original_paths = {name: getattr(template, name) for name in REPOSITORY_PATHS}
+    try:
+        os.chdir(root)
+        for name, path in original_paths.items():
+            setattr(template, name, root / path.relative_to(original_paths['CURRENT_DIRECTORY']))
+        yield
+    finally:
+        os.chdir(original_path)
+        for name, path in original_paths.items():
+            setattr(template, name, path)
+
+
+def _generate_repository(
+    root: Path,
+    number_of_documents: int,
+    number_of_chapters: int,
+    number_of_questions: int,
+    number_of_bib_entries: int,
+) -> None:
+    paragraph = ' '.join([
+        'Testing is a set of activities to discover defects and evaluate the quality of software artifacts.',
+        'The product ${metadata.variables.product} with code ${metadata.code} is described in this chapter.',
+    ] * 4)
+    for document_number in range(1, number_of_documents + 1):
+        document_name = f'document-{document_number:03d}'
+        document_directory = root / document_name
+        document_directory.mkdir(parents=True)
+
+        with (document_directory / 'metadata.yml').open('wt') as f:
+            print('type: Syllabus', file=f)
+            print(f'title: Synthetic Document {document_number}', file=f)
+            print(f'code: CT-SYN{document_number}', file=f)
+            print('version: v1.0', file=f)
+            print('language: en', file=f)
+            print('variables:', file=f)
+            print(f'  product: Product {document_number}', file=f)
+
+        with (document_directory / 'bibliography.bib').open('wt') as f:
+            for entry_number in range(1, number_of_bib_entries + 1):
+                print(f'@book{{ref-{entry_number},', file=f)
+                print(f'  author = {{Author {entry_number}}},', file=f)
+                print(f'  title = {{Title {entry_number}}},', file=f)
+                print('  year = {2024},', file=f)
+                print('}', file=f)
+                print(file=f)
+
+        chapter_paths = []
+        for chapter_number in range(1, number_of_chapters + 1):
+            chapter_path = document_directory / f'chapter-{chapter_number:03d}.md'
+            chapter_paths.append(chapter_path)
+            with chapter_path.open('wt') as f:
+                print(f'# Chapter {chapter_number} {{#chapter-{chapter_number}}}', file=f)
+                for section_number in range(1, 6):
+                    print(file=f)
+                    print(f'## Section {chapter_number}.{section_number} {{#section-{chapter_number}-{section_number}}}', file=f)
+                    print(file=f)
+                    print(paragraph, file=f)
+                    print(file=f)
+                    referenced_chapter_number = (chapter_number + section_number) % number_of_chapters + 1
+                    referenced_entry_number = (chapter_number * 7 + section_number) % number_of_bib_entries + 1
+                    print(
+                        f'See <#section:chapter-{referenced_chapter_number}> and '
+                        f'<#section:section-{referenced_chapter_number}-{section_number}> as well as [@ref-{referenced_entry_number}].',
+                        file=f,
+                    )
+
+        with (document_directory / 'questions.md').open('wt') as f:
+            for question_number in range(1, number_of_questions + 1):
+                if question_number > 1:
+                    print(file=f)
+                print('# metadata', file=f)
+                print(f'lo: FL-{question_number % number_of_chapters + 1}.1.1', file=f)
+                print('k-level: K2', file=f)
+                print('points: 1', file=f)
+                print(f'correct: {"abcd"[question_number % 4]}', file=f)
+                print(file=f)
+                print('## question', file=f)
+                print(f'Which statement about ${{metadata.code}} and question {question_number} is true?', file=f)
+                print(file=f)
+                print('## answers', file=f)
+                for answer_letter in 'abcd':
+                    print(f'{answer_letter}) Statement {answer_letter} about question {question_number}', file=f)
+                print(file=f)
+                print('## justification', file=f)
+                for answer_letter in 'abcd':
+                    print(f'{answer_letter}) Explanation of statement {answer_letter}', file=f)
+
+        with (root / f'{document_name}-syllabus.tex').open('wt') as f:
+            print('\\documentclass{istqb}', file=f)
+            print('\\usepackage{markdown}', file=f)
+            print(f'\\markdownInput[snippet=metadata]{{{document_name}/metadata.yml}}', file=f)
+            print(f'\\addbibresource{{{document_name}/bibliography.bib}}', file=f)
+            print('\\begin{document}', file=f)
+            for chapter_path in chapter_paths:
+                print(f'\\markdownInput{{{chapter_path.relative_to(root)}}}', file=f)
+            print('\\printistqbbibliography', file=f)
+            print('\\end{document}', file=f)
+
+        with (root / f'{document_name}-sample-exam-questions.tex').open('wt') as f:
+            print('\\documentclass{istqb}', file=f)
+            print('\\usepackage{markdown}', file=f)
+            print(f'\\markdownInput[snippet=metadata]{{{document_name}/metadata.yml}}', file=f)
+            print('\\begin{document}', file=f)
+            print(f'\\markdownInput{{{document_name}/questions.yml}}', file=f)
+            print('\\end{document}', file=f)
+
+
+def benchmark_synthetic(args: Namespace) -> None:
+    results = []
+    for scale in args.scales:
+        sizes = {
+            'documents': args.documents * scale,
+            'chapters': args.chapters * scale,
+            'questions': args.questions * scale,
+            'bib_entries': args.bib_entries * scale,
+        }
+        with TemporaryDirectory(prefix='istqb-benchmark-') as root_directory:
+            root = Path(root_directory).resolve()
+            _generate_repository(root, sizes['documents'], sizes['chapters'], sizes['questions'], sizes['bib_entries'])
+            with _use_repository(root):
+                results.append({'scale': scale, 'sizes': sizes, 'results': _benchmark_synthetic_repository(root, args)})
+    _print_results({'benchmark': 'synthetic', 'results': results})
+
+
+def _benchmark_synthetic_repository(root: Path, args: Namespace) -> Dict[str, Dict[str, Union[int, float]]]:
+    template._convert_md_questions_to_yaml()
+    questions_markdown_paths = sorted(root.glob('*/questions.md'))
+    syllabus_paths = sorted(root.glob('*-syllabus.tex'))
+    questions_paths = sorted(root.glob('*-sample-exam-questions.tex'))
+    output_directory = root / 'output'
+    output_directory.mkdir()
+
+    def remove_questions_yaml():
+        _clear_caches()
+        for path in root.glob('*/questions.yml'):
+            path.unlink()
+
+    def remove_questions_yaml_and_cache():
+        remove_questions_yaml()
+        template.QUESTIONS_CACHE.unlink(missing_ok=True)
+
+    def compile_tex_files_to_md():
+        for input_path in syllabus_paths + questions_paths:
+            template._compile_tex_file_to_md(input_path, output_directory)
+
+    results = {
+        'find_files': _measure(lambda: list(template._find_files(['all'])), args.repetitions, setup=_clear_caches),
+        'validate_files_tex': _measure(
+            lambda: template._validate_files(['tex'], silent=True, use_cache=False, jobs=args.jobs),
+            args.repetitions, setup=_clear_caches,
+        ),
+        'validate_files_markdown': _measure(
+            lambda: template._validate_files(['markdown'], silent=True, use_cache=False, jobs=args.jobs),
+            args.repetitions, setup=_clear_caches,
+        ),
+        'read_md_questions': _measure(
+            lambda: [dict(template._read_md_questions([path])) for path in questions_markdown_paths],
+            args.repetitions, setup=_clear_caches,
+        ),
+        'convert_md_questions_to_yaml': _measure(
+            lambda: template._convert_md_questions_to_yaml(jobs=args.jobs),
+            args.repetitions, setup=remove_questions_yaml_and_cache,
+        ),
+        'convert_md_questions_to_yaml_cached': _measure(
+            lambda: template._convert_md_questions_to_yaml(jobs=args.jobs),
+            args.repetitions, setup=remove_questions_yaml,
+        ),
+        'convert_yaml_questions_to_md': _measure(
+            lambda: template._convert_yaml_questions_to_md(force_overwrite=True),
+            args.repetitions, setup=_clear_caches,
+        ),
+        'compile_tex_file_to_md': _measure(compile_tex_files_to_md, args.repetitions, setup=_clear_caches),
+    }
+    if shutil.which('texlua') is not None:
+        results['validate_files_all_yaml'] = _measure(
+            lambda: template._validate_files(['all-yaml'], silent=True, use_cache=False, jobs=args.jobs),
+            args.repetitions, setup=_clear_caches,
+        )
+    return results
+
+
+def benchmark_questions(args: Namespace) -> None:
+    with TemporaryDirectory(prefix='istqb-benchmark-') as root_directory:
+        root = Path(root_directory).resolve()
+        _generate_repository(root, args.documents, 1, args.questions, 1)
+        questions_markdown_paths = sorted(root.glob('*/questions.md'))
+
+        def remove_questions_yaml_and_cache():
+            _clear_caches()
+            for path in root.glob('*/questions.yml'):
+                path.unlink(missing_ok=True)
+            template.QUESTIONS_CACHE.unlink(missing_ok=True)
+
+        with _use_repository(root):
+            results = {
+                'read_md_questions': _measure(
+                    lambda: [dict(template._read_md_questions([path])) for path in questions_markdown_paths],
+                    args.repetitions,
+                ),
+                'convert_md_questions_to_yaml': _measure(
+                    lambda: template._convert_md_questions_to_yaml(jobs=args.jobs),
+                    args.repetitions, setup=remove_questions_yaml_and_cache,
+                ),
+            }
+    _print_results({
+        'benchmark': 'questions',
+        'number_of_files': args.documents,
+        'number_of_questions_per_file': args.questions,
+        'results': results,
+    })
+
+
+def _run_template(*args: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([f'{Path(template.__file__).parent}', os.environ.get('PYTHONPATH', '')]))
+    return subprocess.run([sys.executable, *args], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+
+
+def _measure_import_time() -> Dict[str, float]:
+    import_times = dict()
+    for line in _run_template('-X', 'importtime', '-c', 'import template').stderr.splitlines():
+        match = IMPORT_TIME_REGEXP.match(line)
+        if match:
+            import_times[match.group('module')] = int(match.group('cumulative')) / 1e6
+    return import_times
+
+
+def benchmark_startup(args: Namespace) -> None:
+    import_times = [_measure_import_time() for _ in range(args.repetitions)]
+    import_seconds = min(import_time['template'] for import_time in import_times)  # includes the modules that template.py imports
+    eagerly_imported_modules = sorted(set(LAZILY_IMPORTED_MODULES) & set(chain(*import_times)))
+    template_path = Path(template.__file__)
+    _print_results({
+        'benchmark': 'startup',
+        'import_seconds': import_seconds,
+        'import_budget_seconds': args.budget,
+        'eagerly_imported_modules': eagerly_imported_modules,
+        'results': {
+            'help': _measure(lambda: _run_template(f'{template_path}', '--help'), args.repetitions),
+            'find_files': _measure(lambda: _run_template(f'{template_path}', 'find-files', 'all'), args.repetitions),
+        },
+    })
+    if eagerly_imported_modules:
+        logging.error('Modules %s should only be imported by the functions that use them', ', '.join(eagerly_imported_modules))
+        sys.exit(1)
+    if import_seconds > args.budget:
+        logging.error('Importing template.py took %.3f seconds, which exceeds the budget of %.3f seconds', import_seconds, args.budget)
+        sys.exit(1)
+
+
+def main():
+    parser = ArgumentParser(
+        prog='benchmark.py',
+        description='Benchmark the processing of ISTQB documents written with the LaTeX+Markdown template',
+    )
+    subparsers = parser.add_subparsers()
+
+    parser_check_yaml = subparsers.add_parser(
+        'check-yaml',
+        help='Compare checking the well-formedness of YAML files with one texlua process per file and with one batched process',
+    )
+    parser_check_yaml.add_argument('-r', '--repetitions', type=int, default=3)
+    parser_check_yaml.add_argument('filenames', nargs='*')
+    parser_check_yaml.set_defaults(func=benchmark_check_yaml)
+
+    parser_synthetic = subparsers.add_parser(
+        'synthetic',
+        help='Time the discovery, validation and conversion of files in generated repositories of increasing sizes',
+    )
+    parser_synthetic.add_argument('-r', '--repetitions', type=int, default=3)
+    parser_synthetic.add_argument('-j', '--jobs', type=int, default=1)
+    parser_synthetic.add_argument('--documents', type=int, default=2, help='The number of syllabi and sample exams')
+    parser_synthetic.add_argument('--chapters', type=int, default=5, help='The number of markdown chapters in every syllabus')
+    parser_synthetic.add_argument('--questions', type=int, default=40, help='The number of questions in every sample exam')
+    parser_synthetic.add_argument('--bib-entries', type=int, default=20, help='The number of BibTeX entries in every syllabus')
+    parser_synthetic.add_argument(
+        '--scales',
+        type=int,
+        nargs='+',
+        default=[1, 2, 4],
+        help='Multiply all the numbers above by each of these factors',
+    )
+    parser_synthetic.set_defaults(func=benchmark_synthetic)
+
+    parser_questions = subparsers.add_parser(
+        'questions',
+        help='Time the parsing and conversion of large generated banks of questions',
+    )
+    parser_questions.add_argument('-r', '--repetitions', type=int, default=3)
+    parser_questions.add_argument('-j', '--jobs', type=int, default=1)
+    parser_questions.add_argument('--documents', type=int, default=1, help='The number of directories with questions')
+    parser_questions.add_argument('--questions', type=int, default=10000, help='The number of questions in every directory')
+    parser_questions.set_defaults(func=benchmark_questions)
+
+    parser_startup = subparsers.add_parser(
+        'startup',
+        help='Time the start of template.py and fail if its import exceeds a budget or imports GitPython, yamale, or PyYAML',
+    )
+    parser_startup.add_argument('-r', '--repetitions', type=int, default=5)
+    parser_startup.add_argument(
+        '--budget',
+        type=float,
+        default=0.2,
+        help='The maximum number of seconds that importing template.py may take',
+    )
+    parser_startup.set_defaults(func=benchmark_startup)
+
+    args = parser.parse_args()
+    if 'func' not in args:
+        parser.print_help()
+    else:
+        args.func(args)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s\t[%(levelname)s]\t%(message)s')
+    main()
@@ -7,7 +7,7 @@ local tinyyaml = require("tinyyaml")
 local file, input, output, ran_ok, err
 local some_failed = false
 for _, filename in ipairs(arg) do
-  file = assert(io.open(arg[1], "r"))
+  file = assert(io.open(filename, "r"))
   input = assert(file:read("*a"))
   ran_ok, err = pcall(function()
     output = tinyyaml.parse(input)
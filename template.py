@@ -5,28 +5,35 @@ Processes ISTQB documents written with the LaTeX+Markdown template.
 
 """
 
-from argparse import ArgumentParser, Namespace
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
+from bisect import bisect_right
 from collections import defaultdict
 from configparser import ConfigParser
-from contextlib import contextmanager, ExitStack
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
 from itertools import chain, repeat
-from functools import lru_cache
+from functools import lru_cache, update_wrapper, wraps
+from hashlib import sha256
+from io import StringIO
 import json
 import logging
 from multiprocessing import Pool
 from pathlib import Path
+from queue import Queue
+import resource
 import subprocess
 from subprocess import CalledProcessError
-from tempfile import NamedTemporaryFile
-from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union, TYPE_CHECKING
+from tempfile import mkdtemp, NamedTemporaryFile, TemporaryDirectory
+from time import perf_counter, sleep, time
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union, TYPE_CHECKING
 import os
 import re
 import shutil
 import sys
 
-from git import Repo, InvalidGitRepositoryError
-import yamale
-import yaml
+if TYPE_CHECKING:  # GitPython, yamale, and PyYAML are slow to import, so we only import them in the functions that use them.
+    from git import Repo
+    import yamale
 
 
 LOGGER = logging.getLogger(__name__)
@@ -47,14 +54,27 @@ ROOT_DIRECTORY = Path(__file__).parent.resolve()
 SCHEMA_DIRECTORY = ROOT_DIRECTORY / 'schema'
 ROOT_COPY_DIRECTORY = CURRENT_DIRECTORY / 'istqb_product_base'
 EXAMPLE_DOCUMENT = CURRENT_DIRECTORY / 'example-document.tex'
-
-CURRENT_REPOSITORY: Optional[Repo]
-try:
-    CURRENT_REPOSITORY = Repo(CURRENT_DIRECTORY, search_parent_directories=True)
-except InvalidGitRepositoryError:
-    CURRENT_REPOSITORY = None
+CACHE_DIRECTORY = CURRENT_DIRECTORY / '.istqb-cache'
+VALIDATION_CACHE = CACHE_DIRECTORY / 'validation.json'
+BUILD_HISTORY = CACHE_DIRECTORY / 'build-history.json'
+EPS_MANIFEST = CACHE_DIRECTORY / 'eps-conversions.json'
+XLSX_MANIFEST = CACHE_DIRECTORY / 'xlsx-conversions.json'
+QUESTIONS_CACHE = CACHE_DIRECTORY / 'questions.json'
+SERVER_SOCKET = CACHE_DIRECTORY / 'server.sock'
+SERVER_COMMANDS = {
+    'find-files', 'affected-documents', 'validate-files', 'compile-tex-to-pdf', 'compile-tex-to-html', 'compile-tex-to-epub',
+    'compile-tex-to-docx', 'compile-tex-to-md',
+}
+SERVER_COMMAND_ALIASES = {'validate': 'validate-files', 'compile': 'compile-tex-to-pdf'}
+DEFAULT_EXPECTED_MEMORY = 2**30
+SUBSTITUTION_DIRECTORY_VARIABLE = 'ISTQB_SUBSTITUTION_DIRECTORY'
+FORMAT_DIRECTORY = CACHE_DIRECTORY / 'formats'
+FORMAT_VARIABLE = 'ISTQB_FORMAT'
+PROFILE_TRACE_VARIABLE = 'ISTQB_PROFILE_TRACE'
+DEFAULT_BASE_REVISION = 'origin/main'
 
 LATEXMKRC = ROOT_DIRECTORY / 'latexmkrc'
+CHECK_YAML = ROOT_DIRECTORY / 'check-yaml.lua'
 ISTQB_CFG = ROOT_DIRECTORY / 'istqb.cfg'
 ISTQB_MK4 = ROOT_DIRECTORY / 'istqb.mk4'
 
@@ -87,6 +107,7 @@ CROSS_REFERENCE_REGEXP = re.compile(
 BIBLIOGRAPHIC_REFERENCE_REGEXP = re.compile(r'(?<![a-zA-Z0-9])@([-a-zA-Z0-9#$%&+<>~/_:.?]+)')  # Bracketed and text citations
 BIBENTRY_REGEXP = re.compile(r'^\s*@[^{]+\{(.+?)\s*,\s*$', re.MULTILINE)
 IDENTIFIER_REGEXP = re.compile(r'#(?P<identifier>\S+)')
+NEWLINE_REGEXP = re.compile(r'\n')
 
 XLSX_REGEXP = re.compile(r'\.xlsx$', flags=re.IGNORECASE)
 EPS_REGEXP = re.compile(r'\.eps$', flags=re.IGNORECASE)
@@ -103,14 +124,21 @@ BOILERPLATE_MARKDOWN_REGEXP = re.compile(r'.*(copyright|revisions).*%s' % MARKDO
 LANGUAGES_REGEXP = re.compile(r'..%s' % YAML_REGEXP.pattern, flags=re.IGNORECASE)
 TRACEABILITY_MATRIX_REGEXP = re.compile(r'traceability-matrix%s' % YAML_REGEXP.pattern, flags=re.IGNORECASE)
 
-QUESTIONS_METADATA_REGEXP = re.compile(r'\s{0,3}#\s*metadata\s*', flags=re.IGNORECASE)
-QUESTIONS_QUESTION_REGEXP = re.compile(r'\s{0,3}##\s*question\s*', flags=re.IGNORECASE)
-QUESTIONS_ANSWERS_REGEXP = re.compile(r'\s{0,3}##\s*answers\s*', flags=re.IGNORECASE)
+CHECK_YAML_OUTPUT_REGEXP = re.compile(
+    r'File (?P<filename>.*?) (?:is not well-formed: (?P<error>.*)|(?P<empty>contained no data)\.|is well-formed\.)'
+)
+
+QUESTIONS_SECTION_REGEXP = re.compile(
+    r'\s{0,3}(?:#\s*(?P<metadata>metadata)|'
+    r'##\s*(?:(?P<question>question)|(?P<answers>answers)|(?P<explanation>explanation|justification)))\s*',
+    flags=re.IGNORECASE,
+)
 QUESTIONS_ANSWER_REGEXP = re.compile(
     r'^[ ]{0,3}(?P<number_or_letter>[a-e1-5])[.)]((?!\n\n)\s)*(?P<text>((?!(\r?\n|\r){2})(?!^\s{0,3}[a-e1-5][.)]).)*)',
     flags=re.MULTILINE | re.DOTALL,
 )
-QUESTIONS_EXPLANATION_REGEXP = re.compile(r'\s{0,3}##\s*(explanation|justification)\s*', flags=re.IGNORECASE)
+QUESTIONS_ANSWER_START_REGEXP = re.compile(r'[ ]{0,3}(?P<number_or_letter>[a-e1-5])[.)]')
+QUESTIONS_ANSWER_END_REGEXP = re.compile(r'\s{0,3}[a-e1-5][.)]')
 
 VARIABLE_PREFIX, VARIABLE_SUFFIX = r'(?:^|(?<=[^\\]))(?P<backslashes>(?:\\\\)*)', r'\$\{(?P<variable_name>[^}]+)\}'
 VARIABLE_REGEXP = re.compile(f'{VARIABLE_PREFIX}{VARIABLE_SUFFIX}')
@@ -123,147 +151,320 @@ PDFTEX_UNPRINTED_REFERENCES = re.compile(PDFTEX_UNPRINTED_REFERENCES.replace(' '
 MARKDOWN_HEADING_REGEXP = re.compile(r'^(?P<hashes>#{1,6})\s+(?P<title>.*?)(?P<attrs>\s+\{[^{}]*\})?\s*$')
 MARKDOWN_LIST_ITEM_REGEXP = re.compile(r'^(?P<indent>\s*)(?:[-*+]|\d+[.)])\s+(?P<text>.+?)\s*$')
 
+# The precompiled format contains the class and the markdown package, so that TeX does not need to load them on every pass.
+# The index is set up only after the format has been loaded, because its filename depends on the name of the job.
+ISTQB_FORMAT_SOURCE = r'''
+\makeatletter
+\let\istqbformat@deferred\@empty
+\def\istqbformat@defermakeindex[#1]{\g@addto@macro\istqbformat@deferred{\istqbformat@makeindex[#1]}}
+\def\istqbformat@makeindexlater{\@ifnextchar[\istqbformat@defermakeindex{\istqbformat@defermakeindex[]}}
+\AddToHook{package/imakeidx/after}{\let\istqbformat@makeindex\makeindex\let\makeindex\istqbformat@makeindexlater}
+\documentclass{istqb}
+\usepackage{markdown}
+\let\makeindex\istqbformat@makeindex
+\renewcommand\documentclass[2][]{\istqbformat@deferred}
+\makeatother
+\dump
+'''.strip()
+ISTQB_FORMAT_PREAMBLE_REGEXP = re.compile(r'\A\s*\\documentclass{istqb}\s*\\usepackage{markdown}')
+FORMAT_ERROR_REGEXP = re.compile(r"Fatal format file error|I can't find the format file|was written by")
+
+LATEXMK_RULE_REGEXP = re.compile(r"Run number [0-9]+ of rule '(?P<rule>[^']*)'")
+
+MEMORY_SIZE_REGEXP = re.compile(r'(?P<number>[0-9]+(\.[0-9]*)?)\s*(?P<unit>([kmgt]i?)?b?)', flags=re.IGNORECASE)
+MEMORY_SIZE_MULTIPLIERS = {'': 1, 'B': 1, 'K': 2**10, 'M': 2**20, 'G': 2**30, 'T': 2**40}
+
 TEXLOGFILTER_FORBIDDEN_LINES = re.compile(r'imakeidx|fancyhdr|newunicodechar|hyperref|lipsum|LaTeX Font Warning|\(Font\)|\\@parboxrestore')
 
 
 FileLocation = Tuple[Path, int]
+LineLocation = Tuple[Path, int, int]
 
 
 @contextmanager
-def _replace_variables_for_single_tex_file(input_paths: Iterable[Path], tex_input_path: Path, dry_run=False):
-    input_paths = list(input_paths)
-    backups = {}
+def _trace(name: str, category: str = 'phase', **arguments: Any) -> Iterator[Dict[str, Any]]:
+    # Append a complete event in the Chrome trace event format to the file shared by this process and its workers.
+    trace_pathname = os.environ.get(PROFILE_TRACE_VARIABLE)
+    if trace_pathname is None:
+        yield arguments
+        return
+    start_time = time()
     try:
-        for input_path in input_paths:
-            # Extract the original content.
-            with input_path.open('rb') as f:
-                original_content = f.read()
-            if not dry_run:
-                backups[input_path] = original_content
-            text = original_content.decode()
-            # Extract all available variables.
-            variables: Dict[str, Tuple[Path, str]] = dict()
-            metadata_paths = _find_files(file_types=['metadata'], tex_input_paths=[tex_input_path])
-            for metadata_path in metadata_paths:
-                with metadata_path.open('rt') as f:
-                    metadata_text = f.read()
-                metadata = yaml.safe_load(metadata_text)
-                sources = {
-                    'metadata': metadata,
-                    'metadata.variables': metadata.get('variables', dict()),
-                }
-                for source_prefix, source_dict in sources.items():
-                    for key, value in source_dict.items():
-                        if isinstance(key, str) and isinstance(value, str):
-                            key = f'{source_prefix}.{key}'
-                            if key in variables:
-                                previous_metadata_path, _ = variables[key]
-                                raise ValueError(
-                                    f'The variable "{key}" has been defined twice for file "{input_path}": '
-                                    f'Once in file "{previous_metadata_path}" and once in file "{metadata_path}"'
-                                )
-                            else:
-                                variables[key] = (metadata_path, value)
-
-            # Replace variables in the original content.
-            variable_replacements: Dict[str, Tuple[Path, str]] = dict()
-
-            def replace_variable(match):
-                variable_name = match.group('variable_name')
-                if variable_name not in variables:
-                    character_number = match.start('variable_name')
-                    line_number = _get_line_number_from_file_location((input_path, character_number))
-                    message = f'Variable "${{{variable_name}}}" referenced on line {line_number} of file "{input_path}" not found'
-                    if variables:
-                        nearest_variable_name = _get_nearest_text(variable_name, variables.keys())
-                        metadata_path, _ = variables[nearest_variable_name]
-                        message = f'{message}; did you mean "${{{nearest_variable_name}}}" defined in file "{metadata_path}"?'
-                    raise ValueError(message)
-                else:
-                    metadata_path, variable_value = variables[variable_name]
-                    variable_replacements[variable_name] = (metadata_path, variable_value)
-                    backslashes = '\\' * (len(match.group('backslashes')) // 2)  # halve the number of immediately preceding backslashes
-                return f'{backslashes}{variable_value}'
-
-            def unescape_nonvariable(match):
-                variable_name = match.group('variable_name')
-                backslashes = '\\' * (len(match.group('backslashes')) // 2)  # halve the number of immediately preceding backslashes
-                return f'{backslashes}${{{variable_name}}}'
-
-            replaced_text = VARIABLE_REGEXP.sub(replace_variable, text)  # replace unescaped variables with variable values
-            replaced_text = ESCAPED_VARIABLE_REGEXP.sub(unescape_nonvariable, replaced_text)  # unescape escaped variables
-            if not dry_run:
-                with input_path.open('wt') as f:
-                    print(replaced_text, file=f)
-
-        yield variable_replacements
+        yield arguments
+    except BaseException as e:
+        arguments['error'] = f'{type(e).__name__}: {e}'
+        raise
     finally:
-        # Restore the original content.
-        if not dry_run:
-            for input_path, original_content in backups.items():
-                with input_path.open('wb') as f:
-                    f.write(original_content)
+        duration = time() - start_time
+        event = {
+            'name': name, 'cat': category, 'ph': 'X', 'ts': start_time * 1e6, 'dur': duration * 1e6,
+            'pid': os.getpid(), 'tid': threading.get_ident(), 'args': arguments,
+        }
+        with open(trace_pathname, 'at') as f:
+            print(json.dumps(event, default=str), file=f)
+
+
+def _traced(name: str, category: str = 'phase') -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(fn)
+        def traced_fn(*args, **kwargs):
+            traced_args = [str(arg) for arg in args if isinstance(arg, (str, int, float, Path))]
+            with _trace(name, category, **({'args': traced_args} if traced_args else {})):
+                return fn(*args, **kwargs)
+        return traced_fn
+    return decorator
+
+
+def _write_profile_trace(events_path: Path, output_path: Path) -> None:
+    events = []
+    with events_path.open('rt') as f:
+        for line in f:
+            events.append(json.loads(line))
+    process_names = {os.getpid(): 'istqb-template'}
+    for event in events:
+        process_names.setdefault(event['pid'], 'worker')
+    for process_id, process_name in process_names.items():
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': process_id, 'args': {'name': process_name}})
+    with output_path.open('wt') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
 
 
-@contextmanager
-def _replace_variables_for_many_tex_files(tex_input_paths: Iterable[Path], dry_run=False):
-    tex_input_paths = list(tex_input_paths)
-    seen_input_paths = defaultdict(lambda: list())
-    input_paths = dict()
+def _load_yaml(text: str) -> Any:
+    import yaml
+    # Use the much faster bindings for libyaml if PyYAML has been built with them.
+    try:
+        return yaml.load(text, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+    except yaml.YAMLError:
+        return yaml.safe_load(text)  # unlike libyaml, PyYAML shows the erroneous text in error messages
+
+
+class FileCache:
+    # Like `lru_cache(maxsize=None)` for functions whose first argument is a file, but can also forget the results for single files.
+    instances: List['FileCache'] = []
+
+    def __init__(self, fn: Callable[..., Any]):
+        update_wrapper(self, fn)
+        self.fn = fn
+        self.results: Dict[Tuple[Any, ...], Any] = dict()
+        FileCache.instances.append(self)
+
+    def __call__(self, path: Path, *args, **kwargs) -> Any:
+        key = (path, args, tuple(sorted(kwargs.items())))
+        if key not in self.results:
+            self.results[key] = self.fn(path, *args, **kwargs)
+        return self.results[key]
+
+    def cache_clear(self) -> None:
+        self.results.clear()
+
+    def forget(self, paths: Set[Path]) -> None:
+        for key in [key for key in self.results if key[0] in paths]:
+            del self.results[key]
+
+
+@FileCache
+def _get_variables_for_tex_file(tex_input_path: Path) -> Dict[str, Tuple[Path, str]]:
+    variables: Dict[str, Tuple[Path, str]] = dict()
+    metadata_paths = _find_files(file_types=['metadata'], tex_input_paths=[tex_input_path])
+    for metadata_path in metadata_paths:
+        with metadata_path.open('rt') as f:
+            metadata_text = f.read()
+        metadata = _load_yaml(metadata_text)
+        sources = {
+            'metadata': metadata,
+            'metadata.variables': metadata.get('variables', dict()),
+        }
+        for source_prefix, source_dict in sources.items():
+            for key, value in source_dict.items():
+                if isinstance(key, str) and isinstance(value, str):
+                    key = f'{source_prefix}.{key}'
+                    if key in variables:
+                        previous_metadata_path, _ = variables[key]
+                        raise ValueError(
+                            f'The variable "{key}" has been defined twice for file "{tex_input_path}": '
+                            f'Once in file "{previous_metadata_path}" and once in file "{metadata_path}"'
+                        )
+                    else:
+                        variables[key] = (metadata_path, value)
+    return variables
+
+
+@FileCache
+def _get_variable_references_from_markdown_file(md_input_path: Path) -> List[Tuple[LineLocation, str]]:
+    results = []
+    with md_input_path.open('rt') as f:
+        text = f.read()
+        for variable_match in VARIABLE_REGEXP.finditer(text):
+            variable_name = variable_match.group('variable_name')
+            character_number = variable_match.start('variable_name')
+            result = _get_line_location_from_file_location((md_input_path, character_number)), variable_name
+            results.append(result)
+    return results
+
+
+def _get_variable_replacements(input_path: Path, tex_input_path: Path) -> Dict[str, Tuple[Path, str]]:
+    variables = _get_variables_for_tex_file(tex_input_path)
+    variable_replacements: Dict[str, Tuple[Path, str]] = dict()
+    for (_, line_number, _), variable_name in _get_variable_references_from_markdown_file(input_path):
+        if variable_name not in variables:
+            message = f'Variable "${{{variable_name}}}" referenced on line {line_number} of file "{input_path}" not found'
+            if variables:
+                nearest_variable_name = _get_nearest_text(variable_name, variables.keys())
+                metadata_path, _ = variables[nearest_variable_name]
+                message = f'{message}; did you mean "${{{nearest_variable_name}}}" defined in file "{metadata_path}"?'
+            raise ValueError(message)
+        variable_replacements[variable_name] = variables[variable_name]
+    return variable_replacements
+
+
+def _replace_variables_in_text(text: str, variables: Dict[str, Tuple[Path, str]]) -> str:
+
+    def replace_variable(match):
+        variable_name = match.group('variable_name')
+        _, variable_value = variables[variable_name]
+        backslashes = '\\' * (len(match.group('backslashes')) // 2)  # halve the number of immediately preceding backslashes
+        return f'{backslashes}{variable_value}'
+
+    def unescape_nonvariable(match):
+        variable_name = match.group('variable_name')
+        backslashes = '\\' * (len(match.group('backslashes')) // 2)  # halve the number of immediately preceding backslashes
+        return f'{backslashes}${{{variable_name}}}'
+
+    replaced_text = VARIABLE_REGEXP.sub(replace_variable, text)  # replace unescaped variables with variable values
+    replaced_text = ESCAPED_VARIABLE_REGEXP.sub(unescape_nonvariable, replaced_text)  # unescape escaped variables
+    return replaced_text
+
+
+def _get_variable_replacements_for_many_tex_files(tex_input_paths: Iterable[Path]) -> Dict[Path, Path]:
+    # Validate the variables of all documents and detect ambiguous variables in a single pass over the markdown files.
+    seen_input_paths: Dict[Path, Tuple[Path, Dict[str, Tuple[Path, str]]]] = dict()
     for tex_input_path in tex_input_paths:
-        input_paths[tex_input_path] = list(_find_files(file_types=['markdown'], tex_input_paths=[tex_input_path]))
-        for input_path in input_paths[tex_input_path]:
-            # Detect ambiguous replacements of unescaped variables.
-            with _replace_variables_for_single_tex_file([input_path], tex_input_path, dry_run=True) as variable_replacements:
-                variable_replacements_tuple = tuple(sorted(variable_replacements.items()))
-                simple_variable_replacements_tuple = tuple(sorted(
-                    (key, value)
-                    for key, (_, value)
-                    in variable_replacements.items()
-                ))
-                seen_input_paths[input_path].append((tex_input_path, variable_replacements_tuple, simple_variable_replacements_tuple))
-            if len(seen_input_paths[input_path]) > 1:
-                previous_tex_input_path, previous_variable_replacements_tuple, previous_simple_variable_replacements_tuple = \
-                    seen_input_paths[input_path][-2]
-                if previous_simple_variable_replacements_tuple != simple_variable_replacements_tuple:
-                    previous_variable_replacements_dict = dict(previous_variable_replacements_tuple)
-                    previous_simple_variable_replacements_dict = dict(previous_simple_variable_replacements_tuple)
-                    variable_replacements_dict = dict(variable_replacements_tuple)
-                    simple_variable_replacements_dict = dict(simple_variable_replacements_tuple)
-                    for ambiguous_variable in sorted(previous_simple_variable_replacements_dict | simple_variable_replacements_dict):
-                        previous_metadata_path, previous_value = previous_variable_replacements_dict[ambiguous_variable]
-                        metadata_path, value = variable_replacements_dict[ambiguous_variable]
-                        if previous_value != value:
-                            break
-                    raise ValueError(
-                        f'File "{input_path}" uses ambiguous variable "${{{ambiguous_variable}}}" and has been referenced in '
-                        f'file "{previous_tex_input_path}", where the variable has value "{previous_value}" defined in file '
-                        f'"{previous_metadata_path}", and in file "{tex_input_path}", where the variable has value "{value}" '
-                        f'defined in file "{metadata_path}"'
-                    )
-    with ExitStack() as stack:
-        if not dry_run:
-            seen_input_paths: Set[Path] = set()
-            for tex_input_path in tex_input_paths:
-                for input_path in input_paths[tex_input_path]:
-                    if input_path in seen_input_paths:
-                        continue
-                    seen_input_paths.add(input_path)
-
-                    # Perform the variable replacement
-                    context_manager = _replace_variables_for_single_tex_file([input_path], tex_input_path, dry_run=False)
-                    stack.enter_context(context_manager)
-        yield
+        for input_path in _find_files(file_types=['markdown'], tex_input_paths=[tex_input_path]):
+            variable_replacements = _get_variable_replacements(input_path, tex_input_path)
+            if input_path in seen_input_paths:
+                previous_tex_input_path, previous_variable_replacements = seen_input_paths[input_path]
+                for ambiguous_variable in sorted(previous_variable_replacements):
+                    previous_metadata_path, previous_value = previous_variable_replacements[ambiguous_variable]
+                    metadata_path, value = variable_replacements[ambiguous_variable]
+                    if previous_value != value:
+                        raise ValueError(
+                            f'File "{input_path}" uses ambiguous variable "${{{ambiguous_variable}}}" and has been referenced in '
+                            f'file "{previous_tex_input_path}", where the variable has value "{previous_value}" defined in file '
+                            f'"{previous_metadata_path}", and in file "{tex_input_path}", where the variable has value "{value}" '
+                            f'defined in file "{metadata_path}"'
+                        )
+            seen_input_paths[input_path] = (tex_input_path, variable_replacements)
+    return {input_path: tex_input_path for input_path, (tex_input_path, _) in seen_input_paths.items()}
+
+
+def _get_substitution_output_path(input_path: Path, substitution_directory: Path) -> Path:
+    try:
+        return substitution_directory / input_path.relative_to(CURRENT_DIRECTORY)
+    except ValueError:
+        # Files outside the current directory are referenced by absolute paths, so we replace them in place.
+        return input_path
+
+
+def _substitute_variables_in_file(
+    input_path: Path,
+    tex_input_path: Path,
+    substitution_directory: Path,
+    backups: Dict[Path, bytes],
+) -> None:
+    with input_path.open('rb') as f:
+        original_content = f.read()
+    original_text = original_content.decode()
+    output_path = _get_substitution_output_path(input_path, substitution_directory)
+    if '${' not in original_text:
+        if output_path != input_path:
+            output_path.unlink(missing_ok=True)
+        return
+    if output_path == input_path:
+        backups[input_path] = original_content
+    replaced_text = _replace_variables_in_text(original_text, _get_variables_for_tex_file(tex_input_path))
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open('wt') as f:
+        print(replaced_text, file=f)
+
+
+def _restore_backups(backups: Dict[Path, bytes]) -> None:
+    for input_path, original_content in backups.items():
+        with input_path.open('wb') as f:
+            f.write(original_content)
+    backups.clear()
+
+
+def _substitute_variables_in_questions(input_paths: Iterable[Path], substitution_directory: Path, backups: Dict[Path, bytes]) -> None:
+    # TeX reads questions from YAML files that were converted from markdown files with unsubstituted variables, so we convert them again.
+    questions_paths = [input_path for input_path in input_paths if QUESTIONS_MARKDOWN_REGEXP.fullmatch(input_path.name)]
+    for parent_directory, cluster_input_paths in _cluster_files(questions_paths):
+        substituted_input_paths = []
+        for input_path in cluster_input_paths:
+            substituted_input_path = _get_substitution_output_path(input_path, substitution_directory)
+            substituted_input_paths.append(substituted_input_path if substituted_input_path.exists() else input_path)
+        yaml_input_path = parent_directory / 'questions.yml'
+        yaml_output_path = _get_substitution_output_path(yaml_input_path, substitution_directory)
+        if all(path == input_path and input_path not in backups for path, input_path in zip(substituted_input_paths, cluster_input_paths)):
+            if yaml_output_path != yaml_input_path:
+                yaml_output_path.unlink(missing_ok=True)
+            continue
+        if yaml_output_path == yaml_input_path and yaml_input_path not in backups and yaml_input_path.exists():
+            with yaml_input_path.open('rb') as f:
+                backups[yaml_input_path] = f.read()
+        questions = [question for input_path in substituted_input_paths for question in _read_md_questions_from_file(input_path)]
+        yaml_output_path.parent.mkdir(parents=True, exist_ok=True)
+        _write_questions_yaml(yaml_output_path, questions)
+
+
+@contextmanager
+def _replace_variables_for_many_tex_files(tex_input_paths: Iterable[Path], dry_run=False) -> Iterator[Optional[Path]]:
+    # Write markdown files with replaced variables to a shadow directory that TeX searches before the current directory.
+    input_paths = _get_variable_replacements_for_many_tex_files(tex_input_paths)
+    if dry_run:
+        yield None
+        return
+    _create_untracked_directory(CACHE_DIRECTORY)
+    substitution_directory = Path(mkdtemp(prefix='substitution-', dir=CACHE_DIRECTORY))
+    backups: Dict[Path, bytes] = dict()
+    try:
+        with _trace('Substitute variables'):
+            for input_path, tex_input_path in input_paths.items():
+                _substitute_variables_in_file(input_path, tex_input_path, substitution_directory, backups)
+            _substitute_variables_in_questions(input_paths, substitution_directory, backups)
+        previous_substitution_directory = os.environ.get(SUBSTITUTION_DIRECTORY_VARIABLE)
+        os.environ[SUBSTITUTION_DIRECTORY_VARIABLE] = f'{substitution_directory}'
+        try:
+            yield substitution_directory
+        finally:
+            if previous_substitution_directory is None:
+                del os.environ[SUBSTITUTION_DIRECTORY_VARIABLE]
+            else:
+                os.environ[SUBSTITUTION_DIRECTORY_VARIABLE] = previous_substitution_directory
+    finally:
+        # Restore the original content.
+        _restore_backups(backups)
+        shutil.rmtree(substitution_directory, ignore_errors=True)
+
+
+def _get_substituted_path(input_path: Path) -> Path:
+    substitution_directory = os.environ.get(SUBSTITUTION_DIRECTORY_VARIABLE)
+    if substitution_directory is None:
+        return input_path
+    try:
+        substituted_path = Path(substitution_directory) / input_path.resolve().relative_to(CURRENT_DIRECTORY)
+    except ValueError:
+        return input_path
+    return substituted_path if substituted_path.exists() else input_path
 
 
 def _validate_variables_for_single_tex_file(input_paths: Iterable[Path], tex_input_path: Path) -> None:
-    with _replace_variables_for_single_tex_file(input_paths, tex_input_path, dry_run=True) as _:
-        pass
+    for input_path in input_paths:
+        _get_variable_replacements(input_path, tex_input_path)
 
 
+@_traced('Validate variables')
 def _validate_variables_for_many_tex_files(tex_input_paths: Iterable[Path]) -> None:
-    with _replace_variables_for_many_tex_files(tex_input_paths, dry_run=True) as _:
-        pass
+    _get_variable_replacements_for_many_tex_files(tex_input_paths)
 
 
 def _get_nearest_text(text: str, texts: Iterable[str]) -> str:
@@ -277,8 +478,8 @@ def _warning(*args, **kwargs) -> None:
     LOGGER.warning(*args, **kwargs)
 
 
-@lru_cache(maxsize=None)
-def _get_identifiers_from_markdown_file(md_input_path: Path) -> List[Tuple[FileLocation, str]]:
+@FileCache
+def _get_identifiers_from_markdown_file(md_input_path: Path) -> List[Tuple[LineLocation, str]]:
     results = []
     with md_input_path.open('rt') as f:
         text = f.read()
@@ -301,18 +502,18 @@ def _get_identifiers_from_markdown_file(md_input_path: Path) -> List[Tuple[FileL
                 for (raw_identifier, identifier_character_number) in raw_identifiers:
                     identifier = f'{prefix}:{raw_identifier}'
                     character_number = attributes_character_number + identifier_character_number
-                    result = (md_input_path, character_number), identifier
+                    result = _get_line_location_from_file_location((md_input_path, character_number)), identifier
                     results.append(result)
     return results
 
 
-def _get_identifiers_from_markdown_files(md_input_paths: Iterable[Path]) -> Iterable[Tuple[FileLocation, str]]:
+def _get_identifiers_from_markdown_files(md_input_paths: Iterable[Path]) -> Iterable[Tuple[LineLocation, str]]:
     for md_input_path in md_input_paths:
         yield from _get_identifiers_from_markdown_file(md_input_path)
 
 
-@lru_cache(maxsize=None)
-def _get_identifiers_from_bib_file(bib_input_path: Path) -> List[Tuple[FileLocation, str]]:
+@FileCache
+def _get_identifiers_from_bib_file(bib_input_path: Path) -> List[Tuple[LineLocation, str]]:
     results = []
     with bib_input_path.open('rt') as f:
         text = f.read()
@@ -320,18 +521,18 @@ def _get_identifiers_from_bib_file(bib_input_path: Path) -> List[Tuple[FileLocat
             group_number, = [group_number + 1 for group_number, group in enumerate(identifier_match.groups()) if group is not None]
             identifier = identifier_match.group(group_number)
             character_number = identifier_match.start(group_number)
-            result = (bib_input_path, character_number), identifier
+            result = _get_line_location_from_file_location((bib_input_path, character_number)), identifier
             results.append(result)
     return results
 
 
-def _get_identifiers_from_bib_files(bib_input_paths: Iterable[Path]) -> Iterable[Tuple[FileLocation, str]]:
+def _get_identifiers_from_bib_files(bib_input_paths: Iterable[Path]) -> Iterable[Tuple[LineLocation, str]]:
     for bib_input_path in bib_input_paths:
         yield from _get_identifiers_from_bib_file(bib_input_path)
 
 
-@lru_cache(maxsize=None)
-def _get_cross_references_from_markdown_file(md_input_path: Path) -> List[Tuple[FileLocation, str]]:
+@FileCache
+def _get_cross_references_from_markdown_file(md_input_path: Path) -> List[Tuple[LineLocation, str]]:
     results = []
     with md_input_path.open('rt') as f:
         text = f.read()
@@ -339,18 +540,18 @@ def _get_cross_references_from_markdown_file(md_input_path: Path) -> List[Tuple[
             group_number, = [group_number + 1 for group_number, group in enumerate(identifier_match.groups()) if group is not None]
             identifier = identifier_match.group(group_number)
             character_number = identifier_match.start(group_number)
-            result = (md_input_path, character_number), identifier
+            result = _get_line_location_from_file_location((md_input_path, character_number)), identifier
             results.append(result)
     return results
 
 
-def _get_cross_references_from_markdown_files(md_input_paths: Iterable[Path]) -> Iterable[Tuple[FileLocation, str]]:
+def _get_cross_references_from_markdown_files(md_input_paths: Iterable[Path]) -> Iterable[Tuple[LineLocation, str]]:
     for md_input_path in md_input_paths:
         yield from _get_cross_references_from_markdown_file(md_input_path)
 
 
-@lru_cache(maxsize=None)
-def _get_bibliographic_references_from_markdown_file(md_input_path: Path) -> List[Tuple[FileLocation, str]]:
+@FileCache
+def _get_bibliographic_references_from_markdown_file(md_input_path: Path) -> List[Tuple[LineLocation, str]]:
     results = []
     with md_input_path.open('rt') as f:
         text = f.read()
@@ -358,31 +559,44 @@ def _get_bibliographic_references_from_markdown_file(md_input_path: Path) -> Lis
             group_number, = [group_number + 1 for group_number, group in enumerate(identifier_match.groups()) if group is not None]
             identifier = identifier_match.group(group_number).rstrip(':.?')
             character_number = identifier_match.start(group_number)
-            result = (md_input_path, character_number), identifier
+            result = _get_line_location_from_file_location((md_input_path, character_number)), identifier
             results.append(result)
     return results
 
 
-def _get_bibliographic_references_from_markdown_files(md_input_paths: Iterable[Path]) -> Iterable[Tuple[FileLocation, str]]:
+def _get_bibliographic_references_from_markdown_files(md_input_paths: Iterable[Path]) -> Iterable[Tuple[LineLocation, str]]:
     for md_input_path in md_input_paths:
         yield from _get_bibliographic_references_from_markdown_file(md_input_path)
 
 
-def _get_line_number_from_file_location(location: FileLocation) -> int:
-    path, character_number = location
-    current_character_number = 0
+@FileCache
+def _get_line_offsets(path: Path) -> Tuple[List[int], int]:
     with path.open('rt') as f:
-        for line_number, line in enumerate(f):
-            if current_character_number + len(line) >= character_number:
-                return line_number + 1
-            current_character_number += len(line)
-    raise ValueError(
-        f'Tried to determine the line number of character {character_number} in file "{path}" '
-        f'but found only {current_character_number} characters'
-    )
+        text = f.read()
+    line_offsets = [0]
+    line_offsets.extend(match.end() for match in NEWLINE_REGEXP.finditer(text))
+    return line_offsets, len(text)
 
 
-@lru_cache(maxsize=None)
+def _get_line_location_from_file_location(location: FileLocation) -> LineLocation:
+    path, character_number = location
+    line_offsets, number_of_characters = _get_line_offsets(path)
+    if character_number > number_of_characters:
+        raise ValueError(
+            f'Tried to determine the line number of character {character_number} in file "{path}" '
+            f'but found only {number_of_characters} characters'
+        )
+    line_number = bisect_right(line_offsets, character_number)
+    column_number = character_number - line_offsets[line_number - 1] + 1
+    return path, line_number, column_number
+
+
+def _get_line_number_from_file_location(location: FileLocation) -> int:
+    _, line_number, _ = _get_line_location_from_file_location(location)
+    return line_number
+
+
+@FileCache
 def _get_references_from_tex_file(tex_input_path: Path, include_sources: bool = True,
                                   include_appendices: bool = True) -> List[Tuple[FileLocation, Path, Iterable[Path]]]:
     results = []
@@ -430,103 +644,191 @@ def _get_flat_references_from_tex_files(tex_input_paths: Iterable[Path], *args,
     return _flatten_references(_get_references_from_tex_files(tex_input_paths, *args, **kwargs))
 
 
-def _find_files(file_types: Iterable[str], tex_input_paths: Optional[Iterable[Path]] = None, root: Path = Path('.')) -> Iterable[Path]:
-    file_types = list(file_types)
-    referenced_files = set(_get_flat_references_from_tex_files(tex_input_paths)) if tex_input_paths is not None else None
-    seen_paths = set()
-    for parent_directory, subdirectories, filenames in os.walk(root, topdown=True, onerror=print, followlinks=True):
-
-        def keep_path(file_type: str, path: Path) -> bool:
-            if path.name.startswith('.'):
-                return False
-            if path.name in {'template.py', 'check-yaml.lua', 'istqb.cfg', 'istqb.mk4', 'latexmkrc', 'requirements.txt'}:
-                return False
-            if path.name.startswith('markdowntheme'):
-                return False
-            if TEMPLATE_REGEXP.search(path.name):
-                return False
-
-            if file_type == 'all':
-                return True
-            if file_type in ('all-yaml', 'user-yaml', 'metadata', 'questions-yaml', 'languages', 'traceability-matrix'):
-                all_yaml_match = YAML_REGEXP.search(path.name)
-
-                if not all_yaml_match:
-                    return False
-                if file_type == 'all-yaml':
+def _get_file_types(path: Path) -> Set[str]:
+    if path.name.startswith('.'):
+        return set()
+    if path.name in {'template.py', 'check-yaml.lua', 'istqb.cfg', 'istqb.mk4', 'latexmkrc', 'requirements.txt'}:
+        return set()
+    if path.name.startswith('markdowntheme'):
+        return set()
+    if TEMPLATE_REGEXP.search(path.name):
+        return set()
+
+    file_types = {'all'}
+    if YAML_REGEXP.search(path.name):
+        file_types.add('all-yaml')
+        languages_match = path.parent.name == 'languages' and LANGUAGES_REGEXP.fullmatch(path.name)
+        if METADATA_REGEXP.fullmatch(path.name):
+            file_types.add('metadata')
+        if QUESTIONS_YAML_REGEXP.fullmatch(path.name):
+            file_types.add('questions-yaml')
+        if languages_match:
+            file_types.add('languages')
+        else:
+            file_types.add('user-yaml')
+        if TRACEABILITY_MATRIX_REGEXP.search(path.name):
+            file_types.add('traceability-matrix')
+    if XLSX_REGEXP.search(path.name):
+        file_types.add('xlsx')
+    if EPS_REGEXP.search(path.name):
+        file_types.add('eps')
+    if TEX_REGEXP.search(path.name):
+        file_types.add('tex')
+    if BIB_REGEXP.search(path.name):
+        file_types.add('bib')
+    if MARKDOWN_REGEXP.search(path.name):
+        file_types.add('markdown')
+    if QUESTIONS_MARKDOWN_REGEXP.fullmatch(path.name):
+        file_types.add('questions-markdown')
+    return file_types
+
+
+class ProjectIndex:
+    # Walk the repository once and answer all subsequent queries about its files from memory.
+    def __init__(self, root: Path):
+        self.root = root
+        self.paths: List[Tuple[Path, bool]] = []
+        self.file_types: Dict[Path, Set[str]] = dict()
+        self.references: Dict[Path, Set[Path]] = dict()
+        self.dependents: Optional[Dict[Path, Set[Path]]] = None
+        self.directories: Set[Path] = set()
+
+        # Files in copies of this repository are only visible when we are looking for languages. We walk the copies last, so that
+        # they do not hide the directories of the project that they link to, such as the example document in this repository.
+        pending_directories: List[Tuple[Path, bool]] = [(root, False)]
+        while pending_directories:
+            directory, is_root_copy = pending_directories.pop(0)
+            for parent_directory, subdirectories, filenames in os.walk(directory, topdown=True, onerror=print, followlinks=True):
+                # Do not visit directories twice, for example through the symbolic link to this repository.
+                real_parent_directory = Path(os.path.realpath(parent_directory))
+                if real_parent_directory in self.directories:
+                    subdirectories[:] = []
+                    continue
+                self.directories.add(real_parent_directory)
+
+                def keep_subdirectory(subdirectory: str) -> bool:
+                    if subdirectory.startswith('.'):
+                        return False
+                    if subdirectory in {'template', 'schema', 'markdown', 'venv'}:
+                        return False
+                    if subdirectory == 'istqb_product_base' and not is_root_copy:
+                        pending_directories.append((Path(parent_directory) / subdirectory, True))
+                        return False
                     return True
 
-                metadata_match = METADATA_REGEXP.fullmatch(path.name)
-                questions_match = QUESTIONS_YAML_REGEXP.fullmatch(path.name)
-                languages_match = path.parent.name == 'languages' and LANGUAGES_REGEXP.fullmatch(path.name)
-                traceability_matrix_match = TRACEABILITY_MATRIX_REGEXP.search(path.name)
-
-                if file_type == 'metadata':
-                    return bool(metadata_match)
-                elif file_type == 'questions-yaml':
-                    return bool(questions_match)
-                elif file_type == 'languages':
-                    return bool(languages_match)
-                elif file_type == 'traceability-matrix':
-                    return bool(traceability_matrix_match)
-                elif file_type == 'user-yaml':
-                    return bool(not languages_match)
-                else:
-                    raise ValueError(f'Unknown file type: {file_type}')
-            elif file_type == 'xlsx':
-                return bool(XLSX_REGEXP.search(path.name))
-            elif file_type == 'eps':
-                return bool(EPS_REGEXP.search(path.name))
-            elif file_type == 'tex':
-                return bool(TEX_REGEXP.search(path.name))
-            elif file_type == 'bib':
-                return bool(BIB_REGEXP.search(path.name))
-            elif file_type == 'markdown':
-                return bool(MARKDOWN_REGEXP.search(path.name))
-            elif file_type == 'questions-markdown':
-                return bool(QUESTIONS_MARKDOWN_REGEXP.fullmatch(path.name))
-            else:
+                subdirectories[:] = [subdirectory for subdirectory in subdirectories if keep_subdirectory(subdirectory)]
+
+                for filename in filenames:
+                    path = (Path(parent_directory) / filename).resolve()
+                    if path not in self.file_types:
+                        self.file_types[path] = _get_file_types(path)
+                    self.paths.append((path, is_root_copy))
+
+    def get_references(self, tex_input_path: Path) -> Set[Path]:
+        if tex_input_path not in self.references:
+            self.references[tex_input_path] = set(_get_flat_references_from_tex_file(tex_input_path))
+        return self.references[tex_input_path]
+
+    def get_dependents(self) -> Dict[Path, Set[Path]]:
+        if self.dependents is None:
+            self.dependents = defaultdict(lambda: set())
+            for tex_input_path in self.find_files(['tex']):
+                self.dependents[tex_input_path].add(tex_input_path)
+                for referenced_path in self.get_references(tex_input_path):
+                    self.dependents[referenced_path].add(tex_input_path)
+        return self.dependents
+
+    def forget(self, paths: Set[Path]) -> None:
+        for path in paths:
+            self.references.pop(path, None)
+        self.dependents = None
+
+    def get_affected_documents(self, paths: Iterable[Path]) -> Set[Path]:
+        dependents = self.get_dependents()
+        affected_documents = set()
+        for path in paths:
+            affected_documents |= dependents.get(path.resolve(), set())
+        return affected_documents
+
+    def find_files(self, file_types: Iterable[str], tex_input_paths: Optional[Iterable[Path]] = None) -> Iterable[Path]:
+        file_types = set(file_types)
+        for file_type in file_types:
+            if file_type not in FILETYPES:
                 raise ValueError(f'Unknown file type: {file_type}')
-
-        def keep_filename(filename: str) -> Tuple[bool, Optional[Path]]:
-            path = (Path(parent_directory) / filename).resolve()
+        referenced_files: Optional[Set[Path]] = None
+        if tex_input_paths is not None:
+            referenced_files = set()
+            for tex_input_path in tex_input_paths:
+                referenced_files |= self.get_references(tex_input_path)
+        seen_paths = set()
+        for path, is_root_copy in self.paths:
+            if is_root_copy and 'languages' not in file_types:
+                continue
             if referenced_files is not None and path not in referenced_files:
-                return False, None
-            if not any(keep_path(file_type, path) for file_type in file_types):
-                return False, None
-            return True, path
-
-        def keep_subdirectory(subdirectory: str) -> bool:
-            if subdirectory.startswith('.'):
-                return False
-            if subdirectory == 'istqb_product_base' and 'languages' not in file_types:
-                return False
-            if subdirectory in {'template', 'schema', 'markdown', 'venv'}:
-                return False
-            return True
+                continue
+            if path in seen_paths or file_types.isdisjoint(self.file_types[path]):
+                continue
+            seen_paths.add(path)
+            yield path
+
+
+@lru_cache(maxsize=None)
+@_traced('Index files')
+def _get_project_index(root: Path) -> ProjectIndex:
+    return ProjectIndex(root)
 
-        removed_subdirectory_indexes = [
-            index
-            for index, subdirectory in enumerate(subdirectories)
-            if not keep_subdirectory(subdirectory)
-        ]
-        for index in sorted(removed_subdirectory_indexes, reverse=True):
-            del subdirectories[index]
 
-        for filename in filenames:
-            should_keep, path = keep_filename(filename)
-            if should_keep and path not in seen_paths:
-                seen_paths.add(path)
-                yield path
+def _invalidate_project_index() -> None:
+    _get_project_index.cache_clear()
 
 
+def _invalidate_caches(paths: Optional[Iterable[Path]] = None) -> None:
+    # Forget what we have read from the given files and from the documents that reference them, or from all files if None.
+    _warning.cache_clear()
+    if paths is None:
+        for file_cache in FileCache.instances:
+            file_cache.cache_clear()
+        _invalidate_project_index()
+        return
+    project_index = _get_project_index(Path('.').resolve())
+    paths = {path.resolve() for path in paths}
+    paths |= project_index.get_affected_documents(paths)
+    project_index.forget(paths)
+    for file_cache in FileCache.instances:
+        file_cache.forget(paths)
+
+
+def _get_affected_tex_files(paths: Iterable[Path], root: Path = Path('.')) -> Set[Path]:
+    project_index = _get_project_index(root.resolve())
+    return project_index.get_affected_documents(paths)
+
+
+def _find_files(file_types: Iterable[str], tex_input_paths: Optional[Iterable[Path]] = None, root: Path = Path('.')) -> Iterable[Path]:
+    project_index = _get_project_index(root.resolve())
+    return project_index.find_files(file_types, tex_input_paths)
+
+
+@_traced('Fix up languages')
 def _fixup_languages() -> None:
     for path in _find_files(file_types=['languages']):
         _fixup_language(path)
 
 
 def _run_command(*args: str, text=False, timeout=60) -> Union[str, bytes]:
-    result = subprocess.check_output(args, text=False, stderr=subprocess.STDOUT, timeout=timeout)
+    with _trace(Path(args[0]).name, category='subprocess', args=list(args)) as trace_arguments:
+
+        def trace_result(exit_status: int, output: bytes) -> None:
+            trace_arguments['exit_status'] = exit_status
+            latexmk_rules = LATEXMK_RULE_REGEXP.findall(output.decode(errors='ignore'))  # latexmk reports the passes it ran
+            if latexmk_rules:
+                trace_arguments['latexmk_rules'] = latexmk_rules
+
+        try:
+            result = subprocess.check_output(args, text=False, stderr=subprocess.STDOUT, timeout=timeout)
+        except CalledProcessError as e:
+            trace_result(e.returncode, e.output)
+            raise
+        trace_result(0, result)
     if text:
         result = result.decode(errors='ignore')
     return result
@@ -552,7 +854,7 @@ def _fixup_language(path: Path) -> None:
     # Is `babel-language` already in the language definitions?
     with path.open('rt') as rf:
         input_yaml_text = rf.read()
-    input_yaml = yaml.safe_load(input_yaml_text)
+    input_yaml = _load_yaml(input_yaml_text)
     if 'babel-language' in input_yaml:
         LOGGER.debug('File "%s" already contains `babel-language`', path)
         return
@@ -584,6 +886,7 @@ def _fixup_language(path: Path) -> None:
         wf.write(input_yaml_text)
 
 
+@_traced('Fix up line endings')
 def _fixup_line_endings() -> None:
     for path in _find_files(file_types=['all-yaml', 'markdown', 'tex', 'bib']):
         with path.open('rt', newline='') as rf:
@@ -602,51 +905,362 @@ def _fixup_line_endings() -> None:
         assert '\r' not in input_text
 
 
-def _validate_files(file_types: Iterable[str], silent: bool = False) -> None:
+def _get_file_hash(path: Path) -> str:
+    hasher = sha256()
+    try:
+        with path.open('rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                hasher.update(chunk)
+    except FileNotFoundError:
+        return ''
+    return hasher.hexdigest()
+
+
+def _get_digest(*parts: str) -> str:
+    hasher = sha256()
+    for part in parts:
+        hasher.update(part.encode())
+        hasher.update(b'\0')
+    return hasher.hexdigest()
+
+
+def _get_document_digest(tex_input_path: Path) -> str:
+    referenced_paths = sorted(set(_get_flat_references_from_tex_file(tex_input_path)))
+    return _get_digest(
+        _get_file_hash(tex_input_path),
+        *[f'{referenced_path}:{_get_file_hash(referenced_path)}' for referenced_path in referenced_paths],
+    )
 
-    def validate_yaml_file(schema, path: Path):
-        data = yamale.make_data(path)
-        yamale.validate(schema, data)
-        _run_command('texlua', f'{ROOT_DIRECTORY / "check-yaml.lua"}')
-        if not silent:
-            LOGGER.info('Validated file "%s" with schema "%s"', path, schema.name)
 
-    def validate_tex_file(path: Path):
-        references = list(_get_references_from_tex_files([path]))
-        for (tex_input_path, character_number), original_referenced_path, referenced_paths in references:
-            line_number = _get_line_number_from_file_location((tex_input_path, character_number))
-            if not any(path.exists() for path in referenced_paths):
-                message = f'File "{original_referenced_path}" referenced on line {line_number} of file "{tex_input_path}" not found'
-                all_filenames = [str(path) for path in _find_files(['all'])]
-                if all_filenames:
-                    nearest_filename = _get_nearest_text(str(original_referenced_path), all_filenames)
-                    nearest_path = Path(nearest_filename)
-                    try:
-                        nearest_path = nearest_path.relative_to(tex_input_path.parent)
-                    except ValueError:
-                        pass
-                    message = f'{message}; did you mean "{nearest_path}"?'
-                raise ValueError(message)
+def _create_untracked_directory(directory: Path) -> None:
+    # Keep generated files out of `git status` in the repositories of users, which do not list them in their .gitignore files.
+    directory.mkdir(parents=True, exist_ok=True)
+    gitignore_path = directory / '.gitignore'
+    if not gitignore_path.exists():
+        with gitignore_path.open('wt') as f:
+            print('*', file=f)
 
-        if not silent:
-            LOGGER.info('Validated file "%s" that references %d other files', path, len(references))
 
-    def validate_markdown_file(path: Path, tex_input_path: Path):
-        # Check cross-references.
-        md_identifiers: Dict[str, List[Tuple[Path, int]]] = defaultdict(lambda: list())
-        bib_identifiers: Dict[str, List[Tuple[Path, int]]] = defaultdict(lambda: list())
-        cross_references: Dict[str, List[Tuple[Path, int]]] = defaultdict(lambda: list())
-        bibliographic_references: Dict[str, List[Tuple[Path, int]]] = defaultdict(lambda: list())
-        num_cross_references, num_bibliographic_references = 0, 0
+def _load_json_cache(path: Path) -> Dict[str, Any]:
+    try:
+        with path.open('rt') as f:
+            cache = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return dict()
+    return cache if isinstance(cache, dict) else dict()
+
+
+def _save_json_cache(path: Path, cache: Dict[str, Any]) -> None:
+    # Write to a temporary file first, so that concurrent runs never see a partially written cache.
+    _create_untracked_directory(path.parent)
+    with NamedTemporaryFile('wt', dir=path.parent, prefix=f'.{path.name}.', delete=False) as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(f.name, path)
+
+
+class ValidationCache:
+    # Remember digests of inputs that passed validation, so that files whose inputs did not change can be skipped.
+    # Warnings produced by the validation are remembered as well, so that they can be repeated when the files are skipped.
+
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self.version = _get_digest(_get_file_hash(Path(__file__)), _get_file_hash(CHECK_YAML))
+        self.entries: Dict[str, str] = dict()
+        self.warnings: Dict[str, List[str]] = dict()
+        self.hits, self.misses = 0, 0
+        if path is not None:
+            cache = _load_json_cache(path)
+            if cache.get('version') == self.version:
+                self.entries = cache.get('entries', dict())
+                self.warnings = cache.get('warnings', dict())
+
+    def is_valid(self, key: str, digest: str) -> bool:
+        if self.entries.get(key) == digest:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
 
-        md_input_paths = list(_find_files(file_types=['markdown'], tex_input_paths=[tex_input_path]))
-        for location, md_identifier in _get_identifiers_from_markdown_files(md_input_paths):
-            md_identifiers[md_identifier].append(location)
-            if len(md_identifiers[md_identifier]) > 1:
-                (first_md_input_path, first_character_number), \
-                    (second_md_input_path, second_character_number) = md_identifiers[md_identifier]
-                first_line_number = _get_line_number_from_file_location((first_md_input_path, first_character_number))
-                second_line_number = _get_line_number_from_file_location((second_md_input_path, second_character_number))
+    def add(self, key: str, digest: str, warnings: Iterable[str] = ()) -> None:
+        self.entries[key] = digest
+        warnings = list(warnings)
+        if warnings:
+            self.warnings[key] = warnings
+        else:
+            self.warnings.pop(key, None)
+
+    def get_warnings(self, key: str) -> List[str]:
+        return self.warnings.get(key, list())
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        _save_json_cache(self.path, {'version': self.version, 'entries': self.entries, 'warnings': self.warnings})
+
+
+class BuildHistory:
+    # Remember how long every compilation or conversion took and how much memory it used, so that we can schedule them.
+
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self.entries: Dict[str, Dict[str, float]] = dict()
+        self.updated_entries: Dict[str, Dict[str, float]] = dict()
+        if path is not None:
+            self.entries = {
+                key: entry
+                for key, entry in _load_json_cache(path).items()
+                if isinstance(entry, dict)
+            }
+
+    @staticmethod
+    def get_key(fn: Callable[..., Any], input_path: Path) -> str:
+        return f'{fn.__name__}:{input_path.resolve()}'
+
+    def get_duration(self, key: str) -> Optional[float]:
+        return self.entries.get(key, dict()).get('duration')
+
+    def get_peak_memory(self, key: str) -> Optional[int]:
+        return self.entries.get(key, dict()).get('peak_memory')
+
+    def get_expected_memory(self, fn: Callable[..., Any], input_path: Path) -> int:
+        # For files that we have never processed, expect as much memory as the most demanding file processed by the function.
+        peak_memory = self.get_peak_memory(self.get_key(fn, input_path))
+        if peak_memory is not None:
+            return peak_memory
+        key_prefix = f'{fn.__name__}:'
+        peak_memories = [
+            entry['peak_memory']
+            for key, entry in self.entries.items()
+            if key.startswith(key_prefix) and 'peak_memory' in entry
+        ]
+        return max(peak_memories, default=DEFAULT_EXPECTED_MEMORY)
+
+    def add(self, key: str, duration: float, peak_memory: int) -> None:
+        entry = {'duration': duration, 'peak_memory': peak_memory}
+        self.entries[key] = entry
+        self.updated_entries[key] = entry
+
+    def save(self) -> None:
+        if self.path is not None:
+            # Merge our entries with entries recorded by concurrent runs in the meantime.
+            entries = _load_json_cache(self.path)
+            entries.update(self.updated_entries)
+            _save_json_cache(self.path, entries)
+
+    def sort(self, fn: Callable[..., Any], input_paths: Iterable[Path]) -> List[Path]:
+        # Start with files that we have never processed, then continue from the longest to the shortest durations.
+        def get_sort_key(input_path: Path) -> float:
+            duration = self.get_duration(self.get_key(fn, input_path))
+            return float('-inf') if duration is None else -duration
+
+        return sorted(input_paths, key=get_sort_key)
+
+
+@_traced('Check the well-formedness of YAML files')
+def _check_yaml_files(paths: Iterable[Path], batch_size: int = 500) -> Dict[Path, str]:
+    paths = list(paths)
+    paths_by_filename = {str(path): path for path in paths}
+    problems: Dict[Path, str] = dict()
+    for batch_start in range(0, len(paths), batch_size):
+        batch = paths[batch_start:batch_start + batch_size]
+        try:
+            output = _run_command('texlua', f'{CHECK_YAML}', *map(str, batch), text=True, timeout=600)
+        except CalledProcessError as e:
+            output = e.output.decode(errors='ignore')
+        checked_paths = set()
+        for line in output.splitlines():
+            check_yaml_match = CHECK_YAML_OUTPUT_REGEXP.fullmatch(line)
+            if check_yaml_match is None or check_yaml_match.group('filename') not in paths_by_filename:
+                continue
+            path = paths_by_filename[check_yaml_match.group('filename')]
+            checked_paths.add(path)
+            if check_yaml_match.group('error') is not None:
+                problems[path] = f'File "{path}" is not well-formed: {check_yaml_match.group("error")}'
+            elif check_yaml_match.group('empty') is not None:
+                problems[path] = f'File "{path}" contains no data'
+        for path in batch:
+            if path not in checked_paths:
+                problems[path] = f'File "{path}" could not be checked for well-formedness:\n\n{output}'
+    return problems
+
+
+def _get_number_of_jobs(jobs: Optional[int] = None) -> int:
+    if jobs is not None:
+        if jobs < 1:
+            raise ValueError(f'Expected a positive number of jobs, got {jobs}')
+        return jobs
+    return _get_number_of_available_cpus()
+
+
+def _get_number_of_available_cpus() -> int:
+    try:
+        number_of_cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        number_of_cpus = os.cpu_count() or 1
+
+    # Respect the CPU quota of the control group, for example when we are running in a container.
+    quota, period = None, None
+    try:
+        with open('/sys/fs/cgroup/cpu.max', 'rt') as f:
+            quota, period = f.read().split()
+    except (OSError, ValueError):
+        try:
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us', 'rt') as f:
+                quota = f.read().strip()
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us', 'rt') as f:
+                period = f.read().strip()
+        except OSError:
+            pass
+    if quota is not None and period is not None and quota not in {'max', '-1'}:
+        try:
+            number_of_quota_cpus = -(-int(quota) // int(period))
+        except (ValueError, ZeroDivisionError):
+            pass
+        else:
+            if number_of_quota_cpus > 0:
+                number_of_cpus = min(number_of_cpus, number_of_quota_cpus)
+
+    return max(number_of_cpus, 1)
+
+
+def _map_in_pool(fn: Callable[[Any], Any], items: Iterable[Any], jobs: Optional[int] = None) -> Iterable[Any]:
+    # Yield the results in the order of the items, so that the output is the same regardless of the number of jobs.
+    items = list(items)
+    jobs = min(_get_number_of_jobs(jobs), len(items))
+    if jobs > 1:
+        with Pool(jobs) as pool:
+            yield from pool.imap(fn, items)
+    else:
+        yield from map(fn, items)
+
+
+@lru_cache(maxsize=None)
+def _get_available_memory() -> Optional[int]:
+    # Respect the memory limit of the control group, for example when we are running in a container.
+    for pathname in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(pathname, 'rt') as f:
+                limit = f.read().strip()
+        except OSError:
+            continue
+        if limit == 'max':
+            return None
+        try:
+            limit_in_bytes = int(limit)
+        except ValueError:
+            continue
+        if limit_in_bytes >= 2**62:  # cgroup v1 reports no limit as a very large number
+            return None
+        return limit_in_bytes
+    return None
+
+
+def _parse_memory_size(text: str) -> int:
+    match = MEMORY_SIZE_REGEXP.fullmatch(text.strip())
+    if match is None:
+        raise ArgumentTypeError(f'Expected a memory size such as "4G" or "512M", got "{text}"')
+    number = float(match.group('number'))
+    multiplier = MEMORY_SIZE_MULTIPLIERS[match.group('unit').upper()[:1]]
+    return int(number * multiplier)
+
+
+def _run_and_measure_peak_memory(args: Tuple[Callable[[Any], Any], Any]) -> Tuple[Any, int]:
+    # Every worker runs a single item, so the peak memory of its children belongs to this item.
+    fn, item = args
+    result = fn(item)
+    peak_memory = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if sys.platform != 'darwin':
+        peak_memory *= 1024
+    return result, peak_memory
+
+
+def _imap_with_memory_limit(
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+    expected_memories: Iterable[int],
+    jobs: Optional[int] = None,
+    max_memory: Optional[int] = None,
+) -> Iterable[Tuple[Any, int]]:
+    # Start an item only when the expected peak memory of all running items fits into the limit, and yield results as they come.
+    pending_items = list(zip(items, expected_memories))
+    if not pending_items:
+        return
+    jobs = min(_get_number_of_jobs(jobs), len(pending_items))
+    if max_memory is None:
+        max_memory = _get_available_memory()
+
+    results: 'Queue[Tuple[Any, Optional[BaseException], int]]' = Queue()
+    number_of_running_items, running_memory = 0, 0
+    with Pool(jobs, maxtasksperchild=1) as pool:
+        while pending_items or number_of_running_items > 0:
+            item_index = 0
+            while item_index < len(pending_items) and number_of_running_items < jobs:
+                item, expected_memory = pending_items[item_index]
+                if max_memory is not None and number_of_running_items > 0 and running_memory + expected_memory > max_memory:
+                    item_index += 1
+                    continue
+                del pending_items[item_index]
+                number_of_running_items += 1
+                running_memory += expected_memory
+                pool.apply_async(
+                    _run_and_measure_peak_memory, ((fn, item),),
+                    callback=lambda result, expected_memory=expected_memory: results.put((result, None, expected_memory)),
+                    error_callback=lambda error, expected_memory=expected_memory: results.put((None, error, expected_memory)),
+                )
+            result, error, expected_memory = results.get()
+            number_of_running_items -= 1
+            running_memory -= expected_memory
+            if error is not None:
+                raise error
+            yield result
+
+
+@lru_cache(maxsize=None)
+def _get_yaml_schema(schema_path: Path) -> 'yamale.schema.Schema':
+    import yamale
+    return yamale.make_schema(schema_path)
+
+
+def _validate_yaml_file_with_schema(args: Tuple[Path, Path]) -> Tuple[Path, Optional[str]]:
+    import yamale
+    import yaml
+    schema_path, path = args
+    schema = _get_yaml_schema(schema_path)
+    try:
+        data = yamale.make_data(path)
+        yamale.validate(schema, data)
+    except (yamale.YamaleError, yaml.YAMLError) as e:
+        return path, f'{e}'
+    return path, None
+
+
+@_traced('Validate YAML files with schemas')
+def _validate_yaml_files_with_schemas(schema_and_yaml_paths: Iterable[Tuple[Path, Path]], jobs: Optional[int] = None) -> Dict[Path, str]:
+    schema_and_yaml_paths = list(schema_and_yaml_paths)
+    for schema_path in set(schema_path for schema_path, _ in schema_and_yaml_paths):
+        _get_yaml_schema(schema_path)  # compile the schemas before the pool is forked
+    results = _map_in_pool(_validate_yaml_file_with_schema, schema_and_yaml_paths, jobs=jobs)
+    problems = {path: problem for path, problem in results if problem is not None}
+    return problems
+
+
+class DocumentSymbolTable:
+    # Collect all definitions, cross-references, and citations in the files referenced from a TeX document at once.
+
+    def __init__(self, tex_input_path: Path):
+        self.tex_input_path = tex_input_path
+        self.md_input_paths = list(_find_files(file_types=['markdown'], tex_input_paths=[tex_input_path]))
+        self.bib_input_paths = list(_find_files(file_types=['bib'], tex_input_paths=[tex_input_path]))
+        self.md_identifiers: Dict[str, List[LineLocation]] = defaultdict(lambda: list())
+        self.bib_identifiers: Dict[str, List[LineLocation]] = defaultdict(lambda: list())
+        self.cross_references: Dict[str, List[LineLocation]] = defaultdict(lambda: list())
+        self.bibliographic_references: Dict[str, List[LineLocation]] = defaultdict(lambda: list())
+
+        for location, md_identifier in _get_identifiers_from_markdown_files(self.md_input_paths):
+            self.md_identifiers[md_identifier].append(location)
+            if len(self.md_identifiers[md_identifier]) > 1:
+                (first_md_input_path, first_line_number, _), \
+                    (second_md_input_path, second_line_number, _), *_ = self.md_identifiers[md_identifier]
                 message = (
                     f'Markdown identifier "{md_identifier}" is defined twice, once on line {first_line_number} of file '
                     f'"{first_md_input_path}" and once on line {second_line_number}'
@@ -656,14 +1270,11 @@ def _validate_files(file_types: Iterable[str], silent: bool = False) -> None:
                 else:
                     message = f'{message} of file "{second_md_input_path}"'
                 raise ValueError(message)
-        bib_input_paths = list(_find_files(file_types=['bib'], tex_input_paths=[tex_input_path]))
-        for location, bib_identifier in _get_identifiers_from_bib_files(bib_input_paths):
-            bib_identifiers[bib_identifier].append(location)
-            if len(bib_identifiers[bib_identifier]) > 1:
-                (first_bib_input_path, first_character_number), \
-                    (second_bib_input_path, second_character_number) = bib_identifiers[bib_identifier]
-                first_line_number = _get_line_number_from_file_location((first_bib_input_path, first_character_number))
-                second_line_number = _get_line_number_from_file_location((second_bib_input_path, second_character_number))
+        for location, bib_identifier in _get_identifiers_from_bib_files(self.bib_input_paths):
+            self.bib_identifiers[bib_identifier].append(location)
+            if len(self.bib_identifiers[bib_identifier]) > 1:
+                (first_bib_input_path, first_line_number, _), \
+                    (second_bib_input_path, second_line_number, _), *_ = self.bib_identifiers[bib_identifier]
                 message = (
                     f'BIB identifier "{bib_identifier}" is defined twice, once on line {first_line_number} of file '
                     f'"{first_bib_input_path}" and once on line {second_line_number}'
@@ -673,275 +1284,469 @@ def _validate_files(file_types: Iterable[str], silent: bool = False) -> None:
                 else:
                     message = f'{message} of file "{second_bib_input_path}"'
                 raise ValueError(message)
+        for location, md_identifier in _get_cross_references_from_markdown_files(self.md_input_paths):
+            self.cross_references[md_identifier].append(location)
+        for location, bib_identifier in _get_bibliographic_references_from_markdown_files(self.md_input_paths):
+            self.bibliographic_references[bib_identifier].append(location)
+
+    def check_references(self, md_input_path: Path) -> Tuple[int, int]:
+        cross_references = _get_cross_references_from_markdown_file(md_input_path)
+        bibliographic_references = _get_bibliographic_references_from_markdown_file(md_input_path)
 
-        for location, md_identifier in _get_cross_references_from_markdown_files([path]):
-            cross_references[md_identifier].append(location)
-            num_cross_references += 1
-        for location, bib_identifier in _get_bibliographic_references_from_markdown_files([path]):
-            bibliographic_references[bib_identifier].append(location)
-            num_bibliographic_references += 1
-
-        missing_md_identifiers = cross_references.keys() - md_identifiers.keys() - BUILTIN_IDENTIFIERS
-        for missing_md_identifier in missing_md_identifiers:
-            (md_input_path, character_number), *_ = cross_references[missing_md_identifier]
-            line_number = _get_line_number_from_file_location((md_input_path, character_number))
+        for (_, line_number, _), missing_md_identifier in cross_references:
+            if missing_md_identifier in self.md_identifiers or missing_md_identifier in BUILTIN_IDENTIFIERS:
+                continue
             message = f'Markdown identifier "{missing_md_identifier}" referenced on line {line_number} of file "{md_input_path}" not found'
-            if len(md_input_paths) == 1:
-                message = f'{message} in file "{md_input_paths[0]}"'
+            if len(self.md_input_paths) == 1:
+                message = f'{message} in file "{self.md_input_paths[0]}"'
             else:
-                message = f'{message} in any of the {len(md_input_paths)} markdown files referenced from file "{tex_input_path}"'
-            if md_identifiers:
-                nearest_md_identifier = _get_nearest_text(missing_md_identifier, md_identifiers.keys())
-                (md_input_path, character_number), *_ = md_identifiers[nearest_md_identifier]
-                line_number = _get_line_number_from_file_location((md_input_path, character_number))
+                message = (
+                    f'{message} in any of the {len(self.md_input_paths)} markdown files referenced from file "{self.tex_input_path}"'
+                )
+            if self.md_identifiers:
+                nearest_md_identifier = _get_nearest_text(missing_md_identifier, self.md_identifiers.keys())
+                (nearest_md_input_path, line_number, _), *_ = self.md_identifiers[nearest_md_identifier]
                 message = f'{message}; did you mean "{nearest_md_identifier}" defined on line {line_number} of'
-                if len(md_input_paths) == 1:
+                if len(self.md_input_paths) == 1:
                     message = f'{message} the same file?'
                 else:
-                    message = f'{message} file "{md_input_path}"?'
+                    message = f'{message} file "{nearest_md_input_path}"?'
             raise ValueError(message)
 
-        missing_bib_identifiers = bibliographic_references.keys() - bib_identifiers.keys() - BUILTIN_IDENTIFIERS
-        for missing_bib_identifier in missing_bib_identifiers:
-            (md_input_path, character_number), *_ = bibliographic_references[missing_bib_identifier]
-            line_number = _get_line_number_from_file_location((md_input_path, character_number))
+        for (_, line_number, _), missing_bib_identifier in bibliographic_references:
+            if missing_bib_identifier in self.bib_identifiers or missing_bib_identifier in BUILTIN_IDENTIFIERS:
+                continue
             message = f'BIB identifier "{missing_bib_identifier}" referenced on line {line_number} of file "{md_input_path}" not found'
-            if len(bib_input_paths) == 1:
-                message = f'{message} in file "{bib_input_paths[0]}"'
+            if len(self.bib_input_paths) == 1:
+                message = f'{message} in file "{self.bib_input_paths[0]}"'
             else:
-                message = f'{message} in any of the {len(bib_input_paths)} BIB files referenced from file "{tex_input_path}"'
-            if bib_identifiers:
-                nearest_bib_identifier = _get_nearest_text(missing_bib_identifier, bib_identifiers.keys())
-                (bib_input_path, character_number), *_ = bib_identifiers[nearest_bib_identifier]
-                line_number = _get_line_number_from_file_location((bib_input_path, character_number))
+                message = (
+                    f'{message} in any of the {len(self.bib_input_paths)} BIB files referenced from file "{self.tex_input_path}"'
+                )
+            if self.bib_identifiers:
+                nearest_bib_identifier = _get_nearest_text(missing_bib_identifier, self.bib_identifiers.keys())
+                (bib_input_path, line_number, _), *_ = self.bib_identifiers[nearest_bib_identifier]
                 message = f'{message}; did you mean "{nearest_bib_identifier}" defined on line {line_number} of'
-                if len(bib_input_paths) == 1:
+                if len(self.bib_input_paths) == 1:
                     message = f'{message} the same file?'
                 else:
                     message = f'{message} file "{bib_input_path}"?'
             raise ValueError(message)
 
-        unused_md_identifiers = md_identifiers.keys() - cross_references.keys()
-        for unused_md_identifier in unused_md_identifiers:
-            (md_input_path, character_number), *_ = md_identifiers[unused_md_identifier]
-            line_number = _get_line_number_from_file_location((md_input_path, character_number))
-            if not silent:
-                message = f'Markdown identifier "{unused_md_identifier}" defined on line {line_number} of file "{md_input_path}" is unused'
-                if len(md_input_paths) == 1:
-                    message = f'{message} in file "{md_input_paths[0]}"'
-                else:
-                    message = f'{message} in any of the {len(md_input_paths)} markdown files referenced from file "{tex_input_path}"'
-                _warning(message)
+        return len(cross_references), len(bibliographic_references)
+
+    def get_unused_identifier_warnings(self) -> Iterable[str]:
+        if len(self.md_input_paths) == 1:
+            scope = f'in file "{self.md_input_paths[0]}"'
+        else:
+            scope = f'in any of the {len(self.md_input_paths)} markdown files referenced from file "{self.tex_input_path}"'
+        for unused_md_identifier in sorted(self.md_identifiers.keys() - self.cross_references.keys()):
+            (md_input_path, line_number, _), *_ = self.md_identifiers[unused_md_identifier]
+            yield f'Markdown identifier "{unused_md_identifier}" defined on line {line_number} of file "{md_input_path}" is unused {scope}'
+        for unused_bib_identifier in sorted(self.bib_identifiers.keys() - self.bibliographic_references.keys()):
+            (bib_input_path, line_number, _), *_ = self.bib_identifiers[unused_bib_identifier]
+            yield f'BIB identifier "{unused_bib_identifier}" defined on line {line_number} of file "{bib_input_path}" is unused {scope}'
+
+
+@_traced('Validate markdown document', category='document')
+def _validate_markdown_document(tex_input_path: Path) -> Tuple[Path, List[Tuple[int, str]], Optional[ValueError]]:
+    messages: List[Tuple[int, str]] = []
+    try:
+        md_input_paths = list(_find_files(file_types=['markdown'], tex_input_paths=[tex_input_path]))
+        for md_input_path in md_input_paths:
+            _validate_variables_for_single_tex_file([md_input_path], tex_input_path)
+        if tex_input_path == EXAMPLE_DOCUMENT:
+            message = (
+                f'Skipping the validation of {len(md_input_paths)} markdown documents referenced from example document '
+                f'"{tex_input_path}"'
+            )
+            messages.append((logging.INFO, message))
+        else:
+            symbol_table = DocumentSymbolTable(tex_input_path)
+            for md_input_path in md_input_paths:
+                num_cross_references, num_bibliographic_references = symbol_table.check_references(md_input_path)
+                message = (
+                    f'Validated file "{md_input_path}" that contains {num_cross_references} cross-references and '
+                    f'{num_bibliographic_references} bibliographic references'
+                )
+                messages.append((logging.INFO, message))
+            for message in symbol_table.get_unused_identifier_warnings():
+                messages.append((logging.WARNING, message))
+    except ValueError as e:
+        return tex_input_path, messages, e
+    return tex_input_path, messages, None
+
+
+@_traced('Validate files')
+def _validate_files(file_types: Iterable[str], silent: bool = False, use_cache: bool = True, jobs: Optional[int] = None) -> None:
+    validation_cache = ValidationCache(VALIDATION_CACHE if use_cache else None)
+    unvalidated_yaml_files: Dict[Path, Tuple[str, str, Path]] = dict()
+
+    def validate_yaml_file(schema_path: Path, path: Path):
+        key, digest = f'yaml:{path}', _get_digest(_get_file_hash(schema_path), _get_file_hash(path))
+        if validation_cache.is_valid(key, digest):
+            return
+        unvalidated_yaml_files[path] = (key, digest, schema_path)
 
-        unused_bib_identifiers = bib_identifiers.keys() - bibliographic_references.keys()
-        for unused_bib_identifier in unused_bib_identifiers:
-            (bib_input_path, character_number), *_ = bib_identifiers[unused_bib_identifier]
-            line_number = _get_line_number_from_file_location((bib_input_path, character_number))
+    def validate_yaml_files():
+        # Validate all YAML files at once, so that we can use all CPUs and start texlua only once.
+        problems = _validate_yaml_files_with_schemas(
+            ((schema_path, path) for path, (_, _, schema_path) in unvalidated_yaml_files.items()),
+            jobs=jobs,
+        )
+        well_formedness_problems = _check_yaml_files(path for path in unvalidated_yaml_files if path not in problems)
+        problems.update(well_formedness_problems)
+        if problems:
+            for _, problem in sorted(problems.items()):
+                LOGGER.error('%s', problem)
+            raise ValueError(f'Validation of {len(problems)} out of {len(unvalidated_yaml_files)} YAML files failed')
+        for path, (key, digest, schema_path) in sorted(unvalidated_yaml_files.items()):
+            validation_cache.add(key, digest)
             if not silent:
-                message = f'BIB identifier "{unused_bib_identifier}" defined on line {line_number} of file "{bib_input_path}" is unused'
-                if len(md_input_paths) == 1:
-                    message = f'{message} in file "{md_input_paths[0]}"'
-                else:
-                    message = f'{message} in any of the {len(md_input_paths)} markdown files referenced from file "{tex_input_path}"'
-                _warning(message)
+                LOGGER.info('Validated file "%s" with schema "%s"', path, schema_path)
+        unvalidated_yaml_files.clear()
 
+    def validate_tex_file(path: Path):
+        references = list(_get_references_from_tex_files([path]))
+        key, digest = f'tex:{path}', _get_digest(
+            _get_file_hash(path),
+            *[
+                f'{referenced_path}:{referenced_path.exists()}'
+                for _, _, referenced_paths in references
+                for referenced_path in referenced_paths
+            ],
+        )
+        if validation_cache.is_valid(key, digest):
+            return
+        for (tex_input_path, character_number), original_referenced_path, referenced_paths in references:
+            line_number = _get_line_number_from_file_location((tex_input_path, character_number))
+            if not any(path.exists() for path in referenced_paths):
+                message = f'File "{original_referenced_path}" referenced on line {line_number} of file "{tex_input_path}" not found'
+                all_filenames = [str(path) for path in _find_files(['all'])]
+                if all_filenames:
+                    nearest_filename = _get_nearest_text(str(original_referenced_path), all_filenames)
+                    nearest_path = Path(nearest_filename)
+                    try:
+                        nearest_path = nearest_path.relative_to(tex_input_path.parent)
+                    except ValueError:
+                        pass
+                    message = f'{message}; did you mean "{nearest_path}"?'
+                raise ValueError(message)
+
+        validation_cache.add(key, digest)
         if not silent:
-            LOGGER.info(
-                'Validated file "%s" that contains %d cross-references and %d bibliographic references',
-                path, num_cross_references, num_bibliographic_references,
-            )
+            LOGGER.info('Validated file "%s" that references %d other files', path, len(references))
 
-    for file_type in file_types:
-        if file_type in ('metadata', 'all', 'all-yaml'):
-            schema = yamale.make_schema(SCHEMA_DIRECTORY / 'metadata.yml')
-            for path in _find_files(file_types=['metadata']):
-                validate_yaml_file(schema, path)
-        if file_type in ('questions-yaml', 'all', 'all-yaml'):
-            _convert_md_questions_to_yaml()
-            schema = yamale.make_schema(SCHEMA_DIRECTORY / 'questions.yml')
-            for path in _find_files(file_types=['questions-yaml']):
-                validate_yaml_file(schema, path)
-        if file_type in ('languages', 'all', 'all-yaml'):
-            _fixup_languages()
-            schema = yamale.make_schema(SCHEMA_DIRECTORY / 'language.yml')
-            for path in _find_files(file_types=['languages']):
-                validate_yaml_file(schema, path)
-        if file_type in ('traceability-matrix', 'all', 'all-yaml'):
-            schema = yamale.make_schema(SCHEMA_DIRECTORY / 'traceability-matrix.yml')
-            for path in _find_files(file_types=['traceability-matrix']):
-                validate_yaml_file(schema, path)
-        if file_type in ('tex', 'all'):
-            for path in _find_files(file_types=['tex']):
-                validate_tex_file(path)
-        if file_type in ('markdown', 'all'):
-            tex_input_paths = list(_find_files(file_types=['tex']))
-            for tex_input_path in tex_input_paths:
-                md_input_paths = list(_find_files(file_types=['markdown'], tex_input_paths=[tex_input_path]))
-                for md_input_path in md_input_paths:
-                    _validate_variables_for_single_tex_file([md_input_path], tex_input_path)
-                if tex_input_path == EXAMPLE_DOCUMENT:
-                    LOGGER.info(
-                        'Skipping the validation of %d markdown documents referenced from example document "%s"',
-                        len(md_input_paths), tex_input_path,
-                    )
-                    continue
-                for md_input_path in md_input_paths:
-                    validate_markdown_file(md_input_path, tex_input_path)
-            _validate_variables_for_many_tex_files(tex_input_paths)
+    def validate_markdown_documents(document_digests: Dict[Path, str]):
+        # Validate the documents in parallel but report the results and the first error in the order of the documents.
+        for tex_input_path, messages, error in _map_in_pool(_validate_markdown_document, document_digests, jobs=jobs):
+            if not silent:
+                for level, message in messages:
+                    if level == logging.WARNING:
+                        _warning('%s', message)
+                    else:
+                        LOGGER.log(level, '%s', message)
+            if error is not None:
+                raise error
+            warnings = [message for level, message in messages if level == logging.WARNING]
+            validation_cache.add(f'markdown:{tex_input_path}', document_digests[tex_input_path], warnings)
 
+    try:
+        for file_type in file_types:
+            if file_type in ('metadata', 'all', 'all-yaml'):
+                schema_path = SCHEMA_DIRECTORY / 'metadata.yml'
+                for path in _find_files(file_types=['metadata']):
+                    validate_yaml_file(schema_path, path)
+            if file_type in ('questions-yaml', 'all', 'all-yaml'):
+                _convert_md_questions_to_yaml(jobs)
+                schema_path = SCHEMA_DIRECTORY / 'questions.yml'
+                for path in _find_files(file_types=['questions-yaml']):
+                    validate_yaml_file(schema_path, path)
+            if file_type in ('languages', 'all', 'all-yaml'):
+                _fixup_languages()
+                schema_path = SCHEMA_DIRECTORY / 'language.yml'
+                for path in _find_files(file_types=['languages']):
+                    validate_yaml_file(schema_path, path)
+            if file_type in ('traceability-matrix', 'all', 'all-yaml'):
+                schema_path = SCHEMA_DIRECTORY / 'traceability-matrix.yml'
+                for path in _find_files(file_types=['traceability-matrix']):
+                    validate_yaml_file(schema_path, path)
+            validate_yaml_files()
+            if file_type in ('tex', 'all'):
+                for path in _find_files(file_types=['tex']):
+                    validate_tex_file(path)
+            if file_type in ('markdown', 'all'):
+                tex_input_paths = list(_find_files(file_types=['tex']))
+                document_digests = {tex_input_path: _get_document_digest(tex_input_path) for tex_input_path in tex_input_paths}
+                unvalidated_document_digests = dict()
+                for tex_input_path, digest in document_digests.items():
+                    key = f'markdown:{tex_input_path}'
+                    if not validation_cache.is_valid(key, digest):
+                        unvalidated_document_digests[tex_input_path] = digest
+                    elif not silent:
+                        for message in validation_cache.get_warnings(key):
+                            _warning('%s', message)
+                validate_markdown_documents(unvalidated_document_digests)
+                key, digest = 'variables', _get_digest(*[f'{path}:{digest}' for path, digest in document_digests.items()])
+                if not validation_cache.is_valid(key, digest):
+                    _validate_variables_for_many_tex_files(tex_input_paths)
+                    validation_cache.add(key, digest)
+    finally:
+        validation_cache.save()
+
+    if not silent and use_cache:
+        LOGGER.info(
+            'Skipped %d unchanged inputs and validated %d changed inputs; see "%s"',
+            validation_cache.hits, validation_cache.misses, VALIDATION_CACHE,
+        )
 
-def _convert_eps_files_to_pdf() -> None:
-    for input_path in _find_files(file_types=['eps']):
-        output_path = input_path.parent / f'{input_path.stem}-eps-converted-to.pdf'
-        if not output_path.exists():
-            _run_command('epstopdf', f'{input_path}', f'{output_path}')
-            LOGGER.info('Converted file "%s" to "%s"', input_path, output_path)
 
+def _get_unconverted_paths(
+    manifest: Dict[str, Any],
+    paths: Iterable[Tuple[Path, Path]],
+) -> Tuple[List[Tuple[Path, Path]], Dict[Path, str], int, int]:
+    # Reconvert files whose content has changed since their last conversion, as recorded in a manifest.
+    unconverted_paths, input_hashes = [], dict()
+    number_of_reused_files, number_of_stale_files = 0, 0
+    for input_path, output_path in paths:
+        input_hash = _get_file_hash(input_path)
+        if output_path.exists():
+            if manifest.get(f'{output_path}') == input_hash:
+                number_of_reused_files += 1
+                continue
+            number_of_stale_files += 1
+        unconverted_paths.append((input_path, output_path))
+        input_hashes[output_path] = input_hash
+    return unconverted_paths, input_hashes, number_of_reused_files, number_of_stale_files
+
+
+@_traced('Convert EPS file to PDF', category='document')
+def _convert_eps_file_to_pdf(paths: Tuple[Path, Path]) -> Tuple[Path, Path]:
+    input_path, output_path = paths
+    _run_command('epstopdf', f'{input_path}', f'{output_path}')
+    return input_path, output_path
 
-def _convert_xlsx_files_to_pdf() -> None:
-    for input_path in _find_files(file_types=['xlsx']):
-        output_path = input_path.with_suffix('.pdf')
-        if not output_path.exists():
-            _run_command('libreoffice', '--headless', '--convert-to', 'pdf', f'{input_path}', '--outdir', f'{output_path.parent}')
+
+@_traced('Convert EPS files to PDF')
+def _convert_eps_files_to_pdf(jobs: Optional[int] = None) -> None:
+    manifest = _load_json_cache(EPS_MANIFEST)
+    unconverted_paths, input_hashes, number_of_reused_files, number_of_stale_files = _get_unconverted_paths(manifest, (
+        (input_path, input_path.parent / f'{input_path.stem}-eps-converted-to.pdf')
+        for input_path in _find_files(file_types=['eps'])
+    ))
+
+    try:
+        for input_path, output_path in _map_in_pool(_convert_eps_file_to_pdf, unconverted_paths, jobs=jobs):
+            manifest[f'{output_path}'] = input_hashes[output_path]
             LOGGER.info('Converted file "%s" to "%s"', input_path, output_path)
+    finally:
+        if unconverted_paths:
+            _save_json_cache(EPS_MANIFEST, manifest)
+            _invalidate_project_index()
 
+    if unconverted_paths or number_of_reused_files:
+        LOGGER.info(
+            'Converted %d new and %d stale EPS files to PDF and reused %d up-to-date conversions',
+            len(unconverted_paths) - number_of_stale_files, number_of_stale_files, number_of_reused_files,
+        )
 
-def _answer_number_to_letter(number: Union[int, str]) -> str:
-    return {'1': 'a', '2': 'b', '3': 'c', '4': 'd', '5': 'e'}.get(str(number), str(number))
 
+@_traced('Convert XLSX files in a directory to PDF', category='document')
+def _convert_xlsx_files_in_directory_to_pdf(paths: Tuple[Path, List[Path]]) -> Tuple[Path, List[Path], float]:
+    output_directory, input_paths = paths
+    start_time = perf_counter()
+    # Give every instance of LibreOffice its own user profile, so that several instances can run at the same time.
+    with TemporaryDirectory(prefix='libreoffice-') as profile_directory:
+        _run_command(
+            'libreoffice', f'-env:UserInstallation={Path(profile_directory).as_uri()}', '--headless', '--convert-to', 'pdf',
+            *[f'{input_path}' for input_path in input_paths], '--outdir', f'{output_directory}',
+            timeout=60 * len(input_paths),
+        )
+    duration = perf_counter() - start_time
+    return output_directory, input_paths, duration
+
+
+@_traced('Convert XLSX files to PDF')
+def _convert_xlsx_files_to_pdf(jobs: Optional[int] = None, max_memory: Optional[int] = None) -> None:
+    manifest = _load_json_cache(XLSX_MANIFEST)
+    unconverted_paths, input_hashes, number_of_reused_files, number_of_stale_files = _get_unconverted_paths(manifest, (
+        (input_path, input_path.with_suffix('.pdf'))
+        for input_path in _find_files(file_types=['xlsx'])
+    ))
+
+    # Start LibreOffice only once for all files in an output directory.
+    input_paths_by_output_directory: Dict[Path, List[Path]] = defaultdict(lambda: list())
+    for input_path, output_path in unconverted_paths:
+        input_paths_by_output_directory[output_path.parent].append(input_path)
+
+    build_history = BuildHistory(BUILD_HISTORY)
+    fn = _convert_xlsx_files_in_directory_to_pdf
+    output_directories = build_history.sort(fn, input_paths_by_output_directory)
+    expected_memories = [build_history.get_expected_memory(fn, output_directory) for output_directory in output_directories]
+    batches = [(output_directory, input_paths_by_output_directory[output_directory]) for output_directory in output_directories]
+    try:
+        results = _imap_with_memory_limit(fn, batches, expected_memories, jobs, max_memory)
+        for (output_directory, input_paths, duration), peak_memory in results:
+            build_history.add(build_history.get_key(fn, output_directory), duration, peak_memory)
+            for input_path in input_paths:
+                output_path = input_path.with_suffix('.pdf')
+                manifest[f'{output_path}'] = input_hashes[output_path]
+                LOGGER.info('Converted file "%s" to "%s"', input_path, output_path)
+    finally:
+        if unconverted_paths:
+            build_history.save()
+            _save_json_cache(XLSX_MANIFEST, manifest)
+            _invalidate_project_index()
 
-def _read_md_questions(input_files: Iterable[Path]) -> Iterable[Tuple[int, Dict]]:
-    question_number = 1
+    if unconverted_paths or number_of_reused_files:
+        LOGGER.info(
+            'Converted %d new and %d stale XLSX files to PDF in %d runs of LibreOffice and reused %d up-to-date conversions',
+            len(unconverted_paths) - number_of_stale_files, number_of_stale_files, len(batches), number_of_reused_files,
+        )
+
+
+def _answer_number_to_letter(number: Union[int, str]) -> str:
+    return {'1': 'a', '2': 'b', '3': 'c', '4': 'd', '5': 'e'}.get(str(number), str(number))
 
-    for input_file in input_files:
 
-        question: Optional[Dict] = None
-        section: Optional[str] = None
-        section_line_numbers = []
-        heading_line_number: Optional[int] = None
-
-        with input_file.open('rt') as f:
-            input_md_lines = f.read().splitlines()
-
-        def finish_section():
-            assert question is not None
-            assert section is not None
-            assert heading_line_number is not None
-            if not section_line_numbers:
-                raise ValueError(f'An empty section in file "{input_file}" below line {heading_line_number+1}')
-            section_lines = [input_md_lines[index] for index in section_line_numbers]
-            section_text = '\n'.join(section_lines)
-            line_range = f'{heading_line_number+1}-{max(section_line_numbers)+1}'
-            if section == 'metadata':
-                input_yaml = yaml.safe_load(section_text)
-                if 'lo' not in input_yaml:
-                    raise ValueError(f'Missing YAML key "lo" in file "{input_file}" on lines {line_range}')
-                question['learning-objective'] = input_yaml['lo']
-                if 'k-level' not in input_yaml:
-                    raise ValueError(f'Missing YAML key "k-level" in file "{input_file}" on lines {line_range}')
-                question['k-level'] = input_yaml['k-level']
-                if 'points' not in input_yaml:
-                    raise ValueError(f'Missing YAML key "points" in file "{input_file}" on lines {line_range}')
-                question['number-of-points'] = input_yaml['points']
-                question['additional'] = input_yaml.get('additional', False)
-
-                def normalize_correct_answers(correct: Union[List[Union[str, int]], str, int]) -> List[str]:
-                    def normalize_correct_answer(correct: Union[str, int]) -> Iterable[str]:
-                        if isinstance(correct, str):
-                            for letter in correct:
-                                if letter in (' ', ',', '.', ')'):
-                                    continue
-                                if letter not in ('a', 'b', 'c', 'd', 'e', '1', '2', '3', '4', '5'):
-                                    raise ValueError(
-                                        f'Expected a letter a-e or a number 1-5 in YAML key "correct" in file "{input_file}" '
-                                        f'on lines {line_range}, got "{correct}"'
-                                    )
-                                if letter in ('1', '2', '3', '4', '5'):
-                                    yield _answer_number_to_letter(int(letter))
-                                else:
-                                    yield letter
-                        elif isinstance(correct, int):
-                            if correct not in (1, 2, 3, 4, 5):
+def _read_md_answers(section_lines: Iterable[str]) -> Dict[str, str]:
+    # Read the answers line by line with the same results as `QUESTIONS_ANSWER_REGEXP.finditer()` but in linear time.
+    answers: List[Tuple[str, List[str]]] = []
+    answer_lines: Optional[List[str]] = None
+    skipping_whitespace = False
+    for line in section_lines:
+        if skipping_whitespace and line and (line[0].isspace() or not QUESTIONS_ANSWER_END_REGEXP.match(line)):
+            # Before its text, an answer skips whitespace, including the indentation of the following line.
+            assert answer_lines is not None
+            answer_lines.append(line)
+            skipping_whitespace = not line.strip()
+            continue
+        skipping_whitespace = False
+        if not line or QUESTIONS_ANSWER_END_REGEXP.match(line):  # an empty line or another answer ends the answer
+            answer_lines = None
+            answer_match = QUESTIONS_ANSWER_START_REGEXP.match(line)
+            if answer_match:
+                answer_lines = [line[answer_match.end():]]
+                answers.append((answer_match.group('number_or_letter'), answer_lines))
+                skipping_whitespace = not answer_lines[0].strip()
+        elif answer_lines is not None:
+            answer_lines.append(line)
+    return {
+        _answer_number_to_letter(answer_number): '\n'.join(answer_lines).strip()
+        for answer_number, answer_lines in answers
+    }
+
+
+def _read_md_questions_from_file(input_file: Path) -> List[Dict]:
+    questions: List[Dict] = []
+    question: Optional[Dict] = None
+    section: Optional[str] = None
+    heading_line_number: Optional[int] = None
+
+    with input_file.open('rt') as f:
+        input_md_lines = f.read().splitlines()
+
+    def finish_section(section_end: int):
+        assert question is not None
+        assert section is not None
+        assert heading_line_number is not None
+        section_lines = input_md_lines[heading_line_number + 1:section_end]
+        if not section_lines:
+            raise ValueError(f'An empty section in file "{input_file}" below line {heading_line_number+1}')
+        line_range = f'{heading_line_number+1}-{section_end}'
+        if section == 'metadata':
+            input_yaml = _load_yaml('\n'.join(section_lines))
+            if 'lo' not in input_yaml:
+                raise ValueError(f'Missing YAML key "lo" in file "{input_file}" on lines {line_range}')
+            question['learning-objective'] = input_yaml['lo']
+            if 'k-level' not in input_yaml:
+                raise ValueError(f'Missing YAML key "k-level" in file "{input_file}" on lines {line_range}')
+            question['k-level'] = input_yaml['k-level']
+            if 'points' not in input_yaml:
+                raise ValueError(f'Missing YAML key "points" in file "{input_file}" on lines {line_range}')
+            question['number-of-points'] = input_yaml['points']
+            question['additional'] = input_yaml.get('additional', False)
+
+            def normalize_correct_answers(correct: Union[List[Union[str, int]], str, int]) -> List[str]:
+                def normalize_correct_answer(correct: Union[str, int]) -> Iterable[str]:
+                    if isinstance(correct, str):
+                        for letter in correct:
+                            if letter in (' ', ',', '.', ')'):
+                                continue
+                            if letter not in ('a', 'b', 'c', 'd', 'e', '1', '2', '3', '4', '5'):
                                 raise ValueError(
-                                    f'Expected a number 1-5 in YAML key "correct" in file "{input_file}" '
+                                    f'Expected a letter a-e or a number 1-5 in YAML key "correct" in file "{input_file}" '
                                     f'on lines {line_range}, got "{correct}"'
                                 )
-                            correct = _answer_number_to_letter(correct)
-                            yield correct
-                        else:
-                            assert False
-
-                    if isinstance(correct, (str, int)):
-                        return list(normalize_correct_answer(correct))
-                    elif isinstance(correct, list):
-                        return list(chain(*[normalize_correct_answer(correct_answer) for correct_answer in correct]))
+                            if letter in ('1', '2', '3', '4', '5'):
+                                yield _answer_number_to_letter(int(letter))
+                            else:
+                                yield letter
+                    elif isinstance(correct, int):
+                        if correct not in (1, 2, 3, 4, 5):
+                            raise ValueError(
+                                f'Expected a number 1-5 in YAML key "correct" in file "{input_file}" '
+                                f'on lines {line_range}, got "{correct}"'
+                            )
+                        correct = _answer_number_to_letter(correct)
+                        yield correct
                     else:
-                        raise ValueError(
-                            f'Expected a letter, a number, or a list in YAML key "correct" in file "{input_file}" '
-                            f'on lines {line_range}, got "{correct}" of type "{type(correct)}"'
-                        )
-                if 'correct' in input_yaml:
-                    question['correct'] = normalize_correct_answers(input_yaml['correct'])
-            elif section == 'question':
-                question['question'] = section_text
-            elif section == 'answers':
-                answers = {}
-                for answer_match in QUESTIONS_ANSWER_REGEXP.finditer(section_text):
-                    answer_number = answer_match.group('number_or_letter')
-                    answer_letter = _answer_number_to_letter(answer_number)
-                    answer_text = answer_match.group('text').strip()
-                    answers[answer_letter] = answer_text
-                question['answers'] = answers
-            elif section == 'explanation':
-                question['explanation'] = section_text
-            else:
-                raise ValueError(f'Unknown section "{section}" in file "{input_file}" on lines {line_range}')
-            section_line_numbers.clear()
-
-        for line_number, line in enumerate(input_md_lines):
-            # Check whether a new question has started.
-            metadata_match = QUESTIONS_METADATA_REGEXP.fullmatch(line)
-            if question is None and not metadata_match:
-                if not line.strip():
-                    continue
-                raise ValueError(f'Unexpected line {line_number+1} of file "{input_file}": "{line}"; expected "# metadata" or similar')
-            if metadata_match:
-                if section is not None:
-                    finish_section()
-                if question is not None:
-                    yield question_number, question
-                    question_number += 1
-                question = {}
-                section = 'metadata'
-                heading_line_number = line_number
-                continue
+                        assert False
 
-            # Check whether a new section has started.
-            question_match = QUESTIONS_QUESTION_REGEXP.fullmatch(line)
-            answers_match = QUESTIONS_ANSWERS_REGEXP.fullmatch(line)
-            explanation_match = QUESTIONS_EXPLANATION_REGEXP.fullmatch(line)
-            if question_match:
-                finish_section()
-                section = 'question'
-                heading_line_number = line_number
-                continue
-            if answers_match:
-                finish_section()
-                section = 'answers'
-                heading_line_number = line_number
-                continue
-            if explanation_match:
-                finish_section()
-                section = 'explanation'
-                heading_line_number = line_number
+                if isinstance(correct, (str, int)):
+                    return list(normalize_correct_answer(correct))
+                elif isinstance(correct, list):
+                    return list(chain(*[normalize_correct_answer(correct_answer) for correct_answer in correct]))
+                else:
+                    raise ValueError(
+                        f'Expected a letter, a number, or a list in YAML key "correct" in file "{input_file}" '
+                        f'on lines {line_range}, got "{correct}" of type "{type(correct)}"'
+                    )
+            if 'correct' in input_yaml:
+                question['correct'] = normalize_correct_answers(input_yaml['correct'])
+        elif section == 'question':
+            question['question'] = '\n'.join(section_lines)
+        elif section == 'answers':
+            question['answers'] = _read_md_answers(section_lines)
+        elif section == 'explanation':
+            question['explanation'] = '\n'.join(section_lines)
+        else:
+            raise ValueError(f'Unknown section "{section}" in file "{input_file}" on lines {line_range}')
+
+    # Only look at headings; all other lines belong to the section below the last heading.
+    for line_number, line in enumerate(input_md_lines):
+        section_match = QUESTIONS_SECTION_REGEXP.fullmatch(line) if '#' in line else None
+        next_section = section_match.lastgroup if section_match else None
+
+        # Check whether a new question has started.
+        if question is None and next_section != 'metadata':
+            if not line.strip():
                 continue
+            raise ValueError(f'Unexpected line {line_number+1} of file "{input_file}": "{line}"; expected "# metadata" or similar')
+        if next_section == 'metadata':
+            if section is not None:
+                finish_section(line_number)
+            if question is not None:
+                questions.append(question)
+            question = {}
+            section = next_section
+            heading_line_number = line_number
+        elif next_section is not None:
+            finish_section(line_number)
+            section = next_section
+            heading_line_number = line_number
+
+    if section is not None:
+        finish_section(len(input_md_lines))
+    if question is not None:
+        questions.append(question)
+    return questions
 
-            # Otherwise, accumulate the lines.
-            section_line_numbers.append(line_number)
 
-        if section is not None:
-            finish_section()
-        if question is not None:
+def _read_md_questions(input_files: Iterable[Path]) -> Iterable[Tuple[int, Dict]]:
+    question_number = 1
+    for input_file in input_files:
+        for question in _read_md_questions_from_file(input_file):
             yield question_number, question
             question_number += 1
 
@@ -965,38 +1770,89 @@ def _cluster_files(input_paths: Iterable[Path]) -> Iterable[Tuple[Path, List[Pat
         yield parent_directory, input_paths
 
 
-def _convert_md_questions_to_yaml() -> None:
+def _write_questions_yaml(output_path: Path, questions: List[Dict]) -> None:
+    with output_path.open('wt') as f:
+        print('questions:', file=f)
+        for question_number, question in enumerate(questions, start=1):
+            print(f'  {question_number}:', file=f)
+            print(f'    learning-objective: {json.dumps(question["learning-objective"], ensure_ascii=False)}', file=f)
+            print(f'    k-level: {json.dumps(question["k-level"], ensure_ascii=False)}', file=f)
+            print(f'    number-of-points: {json.dumps(question["number-of-points"], ensure_ascii=False)}', file=f)
+            print(f'    question: {json.dumps(question["question"], ensure_ascii=False)}', file=f)
+            if 'answers' in question:
+                print(f'    answers: {json.dumps(question["answers"], ensure_ascii=False)}', file=f)
+            if 'correct' in question:
+                print(f'    correct: {json.dumps(question["correct"], ensure_ascii=False)}', file=f)
+            print(f'    explanation: {json.dumps(question["explanation"], ensure_ascii=False)}', file=f)
+            print(f'    additional: {"true" if "additional" in question and question["additional"] else "false"}', file=f)
+
+
+def _convert_md_questions_cluster_to_yaml(
+    cluster: Tuple[Path, List[Path], Dict[str, Any]],
+) -> Dict[str, Any]:
+    # Only parse files that changed since their last conversion and renumber the questions from all files.
+    parent_directory, input_paths, cache_entries = cluster
+    output_path = parent_directory / 'questions.yml'
+    questions: List[Dict] = []
+    updated_cache_entries = dict()
+    for input_path in input_paths:
+        input_hash = _get_file_hash(input_path)
+        cache_entry = cache_entries.get(f'{input_path}')
+        if cache_entry is None or cache_entry['hash'] != input_hash:
+            cache_entry = {'hash': input_hash, 'questions': _read_md_questions_from_file(input_path)}
+        updated_cache_entries[f'{input_path}'] = cache_entry
+        questions.extend(cache_entry['questions'])
+
+    formatted_input_paths = ', '.join(f'"{input_path}"' for input_path in input_paths)
+    output_yaml = {'questions': dict(enumerate(questions, start=1))}
+
+    if not output_yaml:
+        _warning('Found no questions in files %s, skipping creation of empty file "%s"', formatted_input_paths, output_path)
+    else:
+        _write_questions_yaml(output_path, questions)
+        LOGGER.info('Converted files %s to "%s"', formatted_input_paths, output_path)
+    return updated_cache_entries
+
+
+@_traced('Convert MD questions to YAML')
+def _convert_md_questions_to_yaml(jobs: Optional[int] = None) -> None:
+    questions_cache = _load_json_cache(QUESTIONS_CACHE)
+    version = _get_file_hash(Path(__file__))  # parsed questions from an older version of this script may differ
+    cache_entries: Dict[str, Any] = questions_cache.get('files', dict()) if questions_cache.get('version') == version else dict()
+    number_of_cache_entries = len(cache_entries)
+
+    clusters, all_input_paths = [], set()
     for parent_directory, input_paths in _cluster_files(_find_files(['questions-markdown'])):
+        all_input_paths.update(f'{input_path}' for input_path in input_paths)
         output_path = parent_directory / 'questions.yml'
         if output_path.exists():
             output_path_modification_time = output_path.stat().st_mtime
             if all(input_path.stat().st_mtime <= output_path_modification_time for input_path in input_paths):
                 _warning('Skipping creation of existing file "%s"', output_path)
                 continue
+        cluster_cache_entries = {
+            f'{input_path}': cache_entries[f'{input_path}']
+            for input_path in input_paths
+            if f'{input_path}' in cache_entries
+        }
+        clusters.append((parent_directory, input_paths, cluster_cache_entries))
+
+    for input_path in list(cache_entries):
+        if input_path not in all_input_paths:
+            del cache_entries[input_path]
+    if not clusters and len(cache_entries) == number_of_cache_entries:
+        return
 
-        formatted_input_paths = ', '.join(f'"{input_path}"' for input_path in input_paths)
-        output_yaml = {'questions': dict(_read_md_questions(input_paths))}
-
-        if not output_yaml:
-            _warning('Found no questions in files %s, skipping creation of empty file "%s"', formatted_input_paths, output_path)
-        else:
-            with output_path.open('wt') as f:
-                print('questions:', file=f)
-                for question_number, question in sorted(output_yaml['questions'].items()):
-                    print(f'  {question_number}:', file=f)
-                    print(f'    learning-objective: {json.dumps(question["learning-objective"], ensure_ascii=False)}', file=f)
-                    print(f'    k-level: {json.dumps(question["k-level"], ensure_ascii=False)}', file=f)
-                    print(f'    number-of-points: {json.dumps(question["number-of-points"], ensure_ascii=False)}', file=f)
-                    print(f'    question: {json.dumps(question["question"], ensure_ascii=False)}', file=f)
-                    if 'answers' in question:
-                        print(f'    answers: {json.dumps(question["answers"], ensure_ascii=False)}', file=f)
-                    if 'correct' in question:
-                        print(f'    correct: {json.dumps(question["correct"], ensure_ascii=False)}', file=f)
-                    print(f'    explanation: {json.dumps(question["explanation"], ensure_ascii=False)}', file=f)
-                    print(f'    additional: {"true" if "additional" in question and question["additional"] else "false"}', file=f)
-                LOGGER.info('Converted files %s to "%s"', formatted_input_paths, output_path)
+    # Convert the clusters, such as the questions in different languages, in parallel.
+    try:
+        for updated_cache_entries in _map_in_pool(_convert_md_questions_cluster_to_yaml, clusters, jobs=jobs):
+            cache_entries.update(updated_cache_entries)
+    finally:
+        _save_json_cache(QUESTIONS_CACHE, {'version': version, 'files': cache_entries})
+        _invalidate_project_index()
 
 
+@_traced('Convert YAML questions to MD')
 def _convert_yaml_questions_to_md(force_overwrite: bool = False) -> None:
     for input_path in _find_files(['questions-yaml']):
         output_path = input_path.with_suffix('.md')
@@ -1006,7 +1862,7 @@ def _convert_yaml_questions_to_md(force_overwrite: bool = False) -> None:
 
         with input_path.open('rt') as f:
             input_yaml_text = f.read()
-        input_yaml = yaml.safe_load(input_yaml_text)
+        input_yaml = _load_yaml(input_yaml_text)
 
         def question_sort_key(question_item: Tuple[int, Dict]):
             question_number, question = question_item
@@ -1047,26 +1903,64 @@ def _convert_yaml_questions_to_md(force_overwrite: bool = False) -> None:
                 print('## justification', file=f)
                 print(normalize_justification(question['explanation'].rstrip('\r\n')), file=f)
             LOGGER.info('Converted file "%s" to "%s"', input_path, output_path)
+        _invalidate_project_index()
 
 
 @lru_cache(maxsize=None)
-def _changed_paths(base_branch='origin/main') -> List[Path]:
-    if CURRENT_REPOSITORY is None:
+@_traced('Open Git repository')
+def _get_current_repository() -> Optional['Repo']:
+    from git import InvalidGitRepositoryError, Repo
+    try:
+        return Repo(CURRENT_DIRECTORY, search_parent_directories=True)
+    except InvalidGitRepositoryError:
+        return None
+
+
+@lru_cache(maxsize=None)
+@_traced('Find changed files')
+def _changed_paths(since: str = DEFAULT_BASE_REVISION, working_tree: bool = False) -> List[Path]:
+    from git import GitCommandError
+    repository = _get_current_repository()
+    if repository is None:
         return []
-    base_commit = CURRENT_REPOSITORY.commit(base_branch)
-    head_commit = CURRENT_REPOSITORY.head.commit
-    changed_paths = []
-    for diff in base_commit.diff(head_commit):
-        if diff.change_type in ('A', 'M'):
-            changed_paths.append((Path(CURRENT_REPOSITORY.git_dir) / '..' / diff.b_path).resolve())
-    return changed_paths
+    git = repository.git
+    try:
+        # Only consider changes made in this branch, not changes made in the base branch since this branch was created.
+        base_commit = git.merge_base(since, 'HEAD')
+        # Let git compare trees and detect renames and copies, so that we never read unchanged files or their histories.
+        diff_args = ['--name-status', '-z', '-M', '-C', '--no-ext-diff', '--no-textconv', base_commit]
+        if not working_tree:
+            diff_args.append('HEAD')
+        diff_output = git.diff(*diff_args)
+        untracked_output = git.ls_files('--others', '--exclude-standard', '-z') if working_tree else ''
+    except GitCommandError as e:
+        message = e.stderr.strip().removeprefix("stderr: '").removesuffix("'").strip()
+        raise ValueError(f'Failed to find files changed since the merge base of "{since}" and HEAD: {message}')
+
+    repository_paths = []
+    diff_fields = iter(diff_output.split('\0'))
+    for change_type in diff_fields:
+        if not change_type:
+            continue
+        if change_type[0] == 'R':  # both the old and the new path of renamed files
+            repository_paths.extend([next(diff_fields), next(diff_fields)])
+        elif change_type[0] == 'C':  # only the new path of copied files
+            next(diff_fields)
+            repository_paths.append(next(diff_fields))
+        else:
+            repository_paths.append(next(diff_fields))
+    repository_paths.extend(path for path in untracked_output.split('\0') if path)
+
+    working_tree_directory = Path(repository.working_tree_dir)
+    return [(working_tree_directory / repository_path).resolve() for repository_path in repository_paths]
 
 
 def _should_do_full_compile() -> bool:
-    if CURRENT_REPOSITORY is None:
+    repository = _get_current_repository()
+    if repository is None:
         return False
     try:
-        branch_name = CURRENT_REPOSITORY.active_branch.name
+        branch_name = repository.active_branch.name
         return branch_name == 'main'
     except TypeError:  # if HEAD is detached
         return False
@@ -1103,7 +1997,7 @@ def _get_metadata_yaml(input_path: Path, action: str) -> Optional[Dict[str, Any]
         return None
     with metadata_path.open('rt') as f:
         metadata_yaml_text = f.read()
-    return yaml.safe_load(metadata_yaml_text)
+    return _load_yaml(metadata_yaml_text)
 
 
 def _should_compile_tex_file_to_pdf(input_path: Path) -> bool:
@@ -1195,7 +2089,7 @@ def _is_sample_exam_answers(input_path: Path) -> bool:
     return 'answers' in input_path.name
 
 
-@lru_cache(maxsize=None)
+@FileCache
 def _get_document_type(input_path: Path) -> Optional[str]:
     metadata_yaml = _get_metadata_yaml(input_path, 'determine the document type')
     if metadata_yaml is None:
@@ -1276,34 +2170,161 @@ def _validate_log_file(input_path: Path) -> None:
         )
 
 
-def _compile_tex_file_to_pdf(input_path: Path, previous_continuous: bool) -> Union[int, Optional[Path]]:
+def _get_tex_build_directory(input_path: Path, build_directory: Path) -> Path:
+    input_path = input_path.resolve()
+    try:
+        relative_input_path = input_path.relative_to(CURRENT_DIRECTORY)
+    except ValueError:
+        relative_input_path = Path(input_path.name)
+    return (build_directory / relative_input_path.with_suffix('')).resolve()
+
+
+def _read_recorded_input_paths(recorder_path: Path) -> List[Path]:
+    working_directory = Path('.')
+    input_paths = set()
+    try:
+        with recorder_path.open('rt', errors='ignore') as f:
+            for line in f:
+                kind, _, pathname = line.rstrip('\n').partition(' ')
+                if kind == 'PWD':
+                    working_directory = Path(pathname)
+                elif kind == 'INPUT':
+                    input_paths.add((working_directory / pathname).resolve())
+    except FileNotFoundError:
+        pass
+    return sorted(input_paths)
+
+
+@_traced('Build precompiled format')
+def _get_istqb_format() -> Optional[Path]:
+    try:
+        tex_version, *_ = _run_command('pdftex', '--version', text=True).splitlines()
+    except (OSError, CalledProcessError):
+        return None
+    template_hashes = [
+        f'{path.relative_to(ROOT_DIRECTORY)}:{_get_file_hash(path)}'
+        for path in sorted((ROOT_DIRECTORY / 'template').rglob('*'))
+        if path.is_file()
+    ]
+    format_name = f'istqb-{_get_digest(tex_version, ISTQB_FORMAT_SOURCE, *template_hashes)[:16]}'
+    format_path = FORMAT_DIRECTORY / f'{format_name}.fmt'
+    manifest_path = format_path.with_suffix('.json')
+    if format_path.exists():
+        # Updating TeX Live packages such as markdown does not change the version of pdfTeX, so we also check the files read by the format.
+        recorded_modification_times = _load_json_cache(manifest_path)
+        current_modification_times = _get_modification_times(map(Path, recorded_modification_times))
+        if manifest_path.exists() and all(
+            current_modification_times[Path(pathname)] == modification_time
+            for pathname, modification_time in recorded_modification_times.items()
+        ):
+            return format_path.with_suffix('')
+        LOGGER.info('Files read by precompiled format "%s" have changed', format_path)
+
+    LOGGER.info('Building precompiled format "%s"', format_path)
+    _create_untracked_directory(CACHE_DIRECTORY)
+    FORMAT_DIRECTORY.mkdir(parents=True, exist_ok=True)
+    job_name = f'{format_name}-{os.getpid()}'
+    source_path = FORMAT_DIRECTORY / f'{job_name}.tex'
+    recorder_path = FORMAT_DIRECTORY / f'{job_name}.fls'
+    with source_path.open('wt') as f:
+        print(ISTQB_FORMAT_SOURCE, file=f)
+    try:
+        _run_command(
+            'pdftex', '-ini', f'-jobname={job_name}', f'-output-directory={FORMAT_DIRECTORY}', '--shell-escape', '-recorder',
+            '-interaction=nonstopmode', '-halt-on-error', '&pdflatex', f'{source_path}', timeout=600,
+        )
+        input_paths = _read_recorded_input_paths(recorder_path)
+    except CalledProcessError as e:
+        _warning('Failed to build precompiled format "%s", compiling without it:\n\n%s', format_path, e.output.decode(errors='ignore'))
+        return None
+    finally:
+        source_path.unlink()
+        recorder_path.unlink(missing_ok=True)
+    input_paths = [input_path for input_path in input_paths if input_path.parent != FORMAT_DIRECTORY]
+    modification_times = _get_modification_times(input_paths)
+    os.replace(FORMAT_DIRECTORY / f'{job_name}.fmt', format_path)
+    _save_json_cache(manifest_path, {f'{input_path}': modification_times[input_path] for input_path in input_paths})
+
+    # Remove formats for previous versions of the template and TeX Live.
+    for stale_format_path in [*FORMAT_DIRECTORY.glob('istqb-*.fmt'), *FORMAT_DIRECTORY.glob('istqb-*.json')]:
+        if stale_format_path not in (format_path, manifest_path):
+            stale_format_path.unlink(missing_ok=True)
+    return format_path.with_suffix('')
+
+
+def _get_latexmk_args(document_build_directory: Optional[Path], format_path: Optional[str]) -> List[str]:
+    latexmk_args = ['-r', f'{LATEXMKRC}']
+    if document_build_directory is None and format_path is None:
+        return latexmk_args
+
+    # Options -pdflatex and -pretex replace the command from latexmkrc, so we repeat its options here.
+    pdflatex_args = ['pdflatex', '--shell-escape', '-interaction=nonstopmode']
+    if format_path is not None:
+        pdflatex_args.append(f'-fmt={format_path}')
+    if document_build_directory is not None:
+        # Keep auxiliary files of every document, including the cache of the markdown package, in a separate directory.
+        latexmk_args.extend([
+            f'-outdir={document_build_directory}',
+            f'-pretex=\\def\\markdownOptionOutputDir{{{document_build_directory}}}',
+        ])
+        pdflatex_args.extend(['%O', '%P'])
+    else:
+        pdflatex_args.extend(['%O', '%S'])
+    latexmk_args.append(f'-pdflatex={" ".join(pdflatex_args)}')
+    return latexmk_args
+
+
+def _compile_tex_file_to_pdf(
+    input_path: Path,
+    build_directory: Optional[Path] = None,
+) -> Union[int, Optional[Path]]:
     if not _should_compile_tex_file_to_pdf(input_path):
         return
-    if previous_continuous:
-        _run_command('latexmk', '-pvc', '-r', f'{LATEXMKRC}', f'{input_path}', timeout=None)
-    else:
+    log_path = Path(f'{input_path.stem}.log')
+    pdf_path = input_path.with_suffix('.pdf')
+    document_build_directory = None
+    if build_directory is not None:
+        document_build_directory = _get_tex_build_directory(input_path, build_directory)
+        document_build_directory.mkdir(parents=True, exist_ok=True)
+        log_path = document_build_directory / log_path.name
+        pdf_path = document_build_directory / pdf_path.name
+    format_path = os.environ.get(FORMAT_VARIABLE)
+    if format_path is not None:
+        with input_path.open('rt') as f:
+            if not ISTQB_FORMAT_PREAMBLE_REGEXP.search(f.read()):
+                format_path = None
+    latexmk_args = _get_latexmk_args(document_build_directory, format_path)
+    try:
         try:
-            _run_command('latexmk', '-r', f'{LATEXMKRC}', f'{input_path}', timeout=600)
+            _run_command('latexmk', *latexmk_args, f'{input_path}', timeout=600)
         except CalledProcessError as e:
-            message_parts = ['Compiling the file "%s" returned non-zero exit status %d and the following output:\n\n%s']
-            message_arguments = [input_path, e.returncode, e.output.decode(errors='ignore')]
-            try:
-                extra_info = '\n'.join(
-                    line
-                    for line
-                    in _run_command('texlogfilter', '--no-box', f'{input_path.stem}.log', text=True).splitlines()
-                    if not TEXLOGFILTER_FORBIDDEN_LINES.search(line)
-                )
-                message_parts.append('Here is some extra information about the potential causes of the issue:\n\n%s')
-                message_arguments.append(extra_info)
-            except CalledProcessError:
-                pass
-            message = '\n\n'.join(message_parts)
-            LOGGER.error(f'{message}\n', *message_arguments)
-            return e.returncode
+            if format_path is None or not FORMAT_ERROR_REGEXP.search(e.output.decode(errors='ignore')):
+                raise
+            LOGGER.info('Failed to use precompiled format "%s" for file "%s", compiling without it', format_path, input_path)
+            _run_command('latexmk', '-g', *_get_latexmk_args(document_build_directory, None), f'{input_path}', timeout=600)
+    except CalledProcessError as e:
+        message_parts = ['Compiling the file "%s" returned non-zero exit status %d and the following output:\n\n%s']
+        message_arguments = [input_path, e.returncode, e.output.decode(errors='ignore')]
+        try:
+            extra_info = '\n'.join(
+                line
+                for line
+                in _run_command('texlogfilter', '--no-box', f'{log_path}', text=True).splitlines()
+                if not TEXLOGFILTER_FORBIDDEN_LINES.search(line)
+            )
+            message_parts.append('Here is some extra information about the potential causes of the issue:\n\n%s')
+            message_arguments.append(extra_info)
+        except CalledProcessError:
+            pass
+        message = '\n\n'.join(message_parts)
+        LOGGER.error(f'{message}\n', *message_arguments)
+        return e.returncode
     project_name = _get_project_name(input_path)
     output_path = Path(f'{project_name}.pdf')
-    input_path.with_suffix('.pdf').rename(output_path)
+    if build_directory is not None:
+        shutil.copyfile(pdf_path, output_path)  # keep the PDF file in the build directory, so that latexmk considers it up-to-date
+    else:
+        pdf_path.rename(output_path)
     return output_path
 
 
@@ -1325,11 +2346,16 @@ def _compile_tex_file_to_epub(input_path: Path, output_directory: Path) -> Optio
 
     def prune_output_directory(parent_directory: str, filenames: List[str]) -> List[str]:
         parent_directory = Path(parent_directory).resolve()
+        pruned_directories = []
         if parent_directory == output_directory.parent:
-            return [output_directory.name]
-        return []
+            pruned_directories.append(output_directory.name)
+        if parent_directory == ROOT_COPY_DIRECTORY.parent:
+            pruned_directories.append(ROOT_COPY_DIRECTORY.name)
+        return pruned_directories
 
     shutil.copytree(input_path.parent, build_directory, ignore=prune_output_directory)
+    if input_path.parent.resolve() == ROOT_COPY_DIRECTORY.parent:
+        _link_root_directory(build_directory / ROOT_COPY_DIRECTORY.name)
 
     with _change_directory(build_directory):
         _run_command(
@@ -1353,12 +2379,12 @@ def _compile_tex_file_to_docx(input_path: Path, output_directory: Path) -> Optio
     markdown_texts = []
     for nested_path in _get_flat_references_from_tex_file(input_path, include_sources=False):
         if MARKDOWN_REGEXP.search(nested_path.name):
-            with nested_path.open('rt') as f:
+            with _get_substituted_path(nested_path).open('rt') as f:
                 markdown_text = f.read()
                 markdown_texts.append(markdown_text)
         elif YAML_REGEXP.search(nested_path.name):
             if QUESTIONS_YAML_REGEXP.fullmatch(nested_path.name):
-                with nested_path.with_suffix('.md').open('rt') as f:
+                with _get_substituted_path(nested_path.with_suffix('.md')).open('rt') as f:
                     markdown_text = f.read()
                     markdown_texts.append(markdown_text)
             else:
@@ -1519,12 +2545,12 @@ def _compile_tex_file_to_md(input_path: Path, output_directory: Path) -> Optiona
         if MARKDOWN_REGEXP.search(nested_path.name):
             if BOILERPLATE_MARKDOWN_REGEXP.search(nested_path.name):
                 continue
-            with nested_path.open('rt') as f:
+            with _get_substituted_path(nested_path).open('rt') as f:
                 markdown_text = f.read()
                 markdown_texts.append(markdown_text)
         elif YAML_REGEXP.search(nested_path.name):
             if QUESTIONS_YAML_REGEXP.fullmatch(nested_path.name):
-                with nested_path.with_suffix('.md').open('rt') as f:
+                with _get_substituted_path(nested_path.with_suffix('.md')).open('rt') as f:
                     markdown_text = f.read()
                     markdown_texts.append(markdown_text)
 
@@ -1546,21 +2572,88 @@ if TYPE_CHECKING:  # The Protocol class is unavailable in Python <3.8 but that s
         def __call__(self, input_path: Path, *args, **kwargs) -> Union[int, Optional[Path]]: ...
 
 
-def _compile_fn(args: Tuple['CompilationFunction', Path, Tuple[Any], Dict[Any, Any]]) -> Tuple[Path, Union[int, Optional[Path]]]:
+def _compile_fn(
+    args: Tuple['CompilationFunction', Path, Tuple[Any], Dict[Any, Any]],
+) -> Tuple[Path, Union[int, Optional[Path]], float]:
     compile_fn, input_path, args, kwargs = args
-    output_path = compile_fn(input_path, *args, *kwargs)
-    return input_path, output_path
+    start_time = perf_counter()
+    with _trace(compile_fn.__name__, category='document', input_path=f'{input_path}'):
+        output_path = compile_fn(input_path, *args, *kwargs)
+    duration = perf_counter() - start_time
+    return input_path, output_path, duration
 
 
-def _should_compile_tex_file(input_path: Path) -> bool:
+def _should_compile_tex_file(input_path: Path, since: str = DEFAULT_BASE_REVISION, working_tree: bool = False) -> bool:
     if _should_do_full_compile():
         return True
     if input_path == EXAMPLE_DOCUMENT:
         return True
 
-    changed_paths = set(_changed_paths())
-    referenced_paths = set(chain([input_path], _get_flat_references_from_tex_file(input_path)))
-    return bool(referenced_paths & changed_paths)
+    return input_path.resolve() in _get_affected_tex_files(_changed_paths(since, working_tree))
+
+
+@_traced('Link template')
+def _link_root_directory(link_directory: Path) -> None:
+    # Expose this repository through a farm of symbolic links that is created once and reused by subsequent compilations.
+    # Language definitions are copied rather than linked, because we add `babel-language` to them.
+    if link_directory.is_symlink():
+        link_directory.unlink()
+    _create_untracked_directory(link_directory)
+    for root_path in ROOT_DIRECTORY.iterdir():
+        if root_path.name.startswith('.') or root_path.name == link_directory.name:
+            continue
+        link_path = link_directory / root_path.name
+        if root_path.name == 'languages':
+            link_path.mkdir(exist_ok=True)
+            for root_language_path in root_path.iterdir():
+                language_path = link_path / root_language_path.name
+                if not language_path.exists() or language_path.stat().st_mtime < root_language_path.stat().st_mtime:
+                    shutil.copyfile(root_language_path, language_path)
+            continue
+        if link_path.is_symlink() and link_path.resolve() == root_path:
+            continue
+        if link_path.is_symlink() or link_path.is_file():
+            link_path.unlink()
+        elif link_path.exists():
+            shutil.rmtree(link_path)
+        try:
+            link_path.symlink_to(root_path, target_is_directory=root_path.is_dir())
+        except FileExistsError:
+            pass
+        except OSError:
+            LOGGER.info('Failed to create a symbolic link "%s" to "%s", copying instead', link_path, root_path)
+            if root_path.is_dir():
+                shutil.copytree(root_path, link_path)
+            else:
+                shutil.copyfile(root_path, link_path)
+
+
+def _run_compilations(
+    compile_fn: 'CompilationFunction',
+    input_paths: Iterable[Path],
+    args: Tuple[Any, ...],
+    kwargs: Dict[str, Any],
+    jobs: Optional[int] = None,
+    max_memory: Optional[int] = None,
+) -> bool:
+    build_history = BuildHistory(BUILD_HISTORY)
+    input_paths = build_history.sort(compile_fn, input_paths)
+    expected_memories = [build_history.get_expected_memory(compile_fn, input_path) for input_path in input_paths]
+    compile_parameters = zip(repeat(compile_fn), input_paths, repeat(args), repeat(kwargs))
+    some_files_failed = False
+    results = _imap_with_memory_limit(_compile_fn, compile_parameters, expected_memories, jobs, max_memory)
+    for (input_path, output_path, duration), peak_memory in results:
+        build_history.add(build_history.get_key(compile_fn, input_path), duration, peak_memory)
+        build_history.save()
+        if isinstance(output_path, int):
+            assert output_path != 0
+            some_files_failed = True
+        elif output_path is None:
+            LOGGER.info('Skipped the compilation of file "%s" because it has been disabled', input_path)
+        else:
+            assert output_path.exists(), f'File "{output_path}" does not exist'
+            LOGGER.info('Compiled file "%s" to "%s"', input_path, output_path)
+    return some_files_failed
 
 
 def _compile_tex_files(
@@ -1568,6 +2661,10 @@ def _compile_tex_files(
     *args,
     input_paths: Optional[Iterable[Path]] = None,
     full_compile: bool = False,
+    since: str = DEFAULT_BASE_REVISION,
+    working_tree: bool = False,
+    jobs: Optional[int] = None,
+    max_memory: Optional[int] = None,
     **kwargs,
 ) -> None:
     if input_paths is None:
@@ -1575,7 +2672,7 @@ def _compile_tex_files(
         if not full_compile and not _should_do_full_compile():
             removed_indexes = []
             for input_path_index, input_path in enumerate(input_paths):
-                if not _should_compile_tex_file(input_path):
+                if not _should_compile_tex_file(input_path, since, working_tree):
                     removed_indexes.append(input_path_index)
                     LOGGER.info('Skipped the compilation of file "%s" because it has not changed in this branch', input_path)
             for removed_index in reversed(removed_indexes):
@@ -1586,66 +2683,343 @@ def _compile_tex_files(
     if not input_paths:
         return
 
-    with _replace_variables_for_many_tex_files(input_paths):
-        os.environ['TEXINPUTS'] = f'.:{ROOT_COPY_DIRECTORY}/template:'
-        try:
+    try:
+        _link_root_directory(ROOT_COPY_DIRECTORY)
+        _invalidate_project_index()
+
+        _validate_files(file_types=['all'], silent=True)
+        if compile_fn in (_compile_tex_file_to_docx, _compile_tex_file_to_md):
+            _convert_yaml_questions_to_md(force_overwrite=True)
+        _fixup_line_endings()
+        _convert_eps_files_to_pdf(jobs)
+        _convert_xlsx_files_to_pdf(jobs, max_memory)
+
+        with _replace_variables_for_many_tex_files(input_paths) as substitution_directory:
+            os.environ['TEXINPUTS'] = f'{substitution_directory}:.:{ROOT_COPY_DIRECTORY}/template:'
             try:
-                shutil.rmtree(ROOT_COPY_DIRECTORY)
-            except FileNotFoundError:
-                pass
-            shutil.copytree(ROOT_DIRECTORY, ROOT_COPY_DIRECTORY)
-
-            _validate_files(file_types=['all'], silent=True)
-            if compile_fn in (_compile_tex_file_to_docx, _compile_tex_file_to_md):
-                _convert_yaml_questions_to_md(force_overwrite=True)
-            _fixup_line_endings()
-            _convert_eps_files_to_pdf()
-            _convert_xlsx_files_to_pdf()
-
-            compile_parameters = zip(repeat(compile_fn), input_paths, repeat(args), repeat(kwargs))
-            some_files_failed = False
-            with Pool(None) as pool:
-                for input_path, output_path in pool.imap_unordered(_compile_fn, compile_parameters):
-                    if isinstance(output_path, int):
-                        assert output_path != 0
-                        some_files_failed = True
-                    elif output_path is None:
-                        LOGGER.info('Skipped the compilation of file "%s" because it has been disabled', input_path)
-                    else:
-                        assert output_path.exists(), f'File "{output_path}" does not exist'
-                        LOGGER.info('Compiled file "%s" to "%s"', input_path, output_path)
-            if some_files_failed:
-                sys.exit(1)
-        finally:
-            del os.environ['TEXINPUTS']
+                if compile_fn is _compile_tex_file_to_pdf:
+                    format_path = _get_istqb_format()
+                    if format_path is not None:
+                        os.environ[FORMAT_VARIABLE] = f'{format_path}'
+                some_files_failed = _run_compilations(compile_fn, input_paths, args, kwargs, jobs, max_memory)
+            finally:
+                del os.environ['TEXINPUTS']
+                os.environ.pop(FORMAT_VARIABLE, None)
+        if some_files_failed:
+            sys.exit(1)
+    finally:
+        _invalidate_project_index()
+
+
+def _compile_tex_files_to_pdf(
+    previous_continuous: bool,
+    input_paths: Optional[Iterable[Path]],
+    full_compile: bool,
+    build_directory: Optional[Path] = None,
+    jobs: Optional[int] = None,
+    max_memory: Optional[int] = None,
+    since: str = DEFAULT_BASE_REVISION,
+    working_tree: bool = False,
+) -> None:
+    if previous_continuous:
+        _watch_tex_files(input_paths, build_directory, jobs, max_memory)
+        return
+    _compile_tex_files(
+        _compile_tex_file_to_pdf, build_directory, input_paths=input_paths, full_compile=full_compile, since=since,
+        working_tree=working_tree, jobs=jobs, max_memory=max_memory,
+    )
+
+
+def _get_modification_times(paths: Iterable[Path]) -> Dict[Path, Optional[int]]:
+    modification_times: Dict[Path, Optional[int]] = dict()
+    for path in paths:
+        try:
+            modification_times[path] = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            modification_times[path] = None
+    return modification_times
+
+
+ModificationTimes = Tuple[Dict[Path, Optional[int]], Dict[Path, Optional[int]]]
+
+
+def _get_project_modification_times() -> ModificationTimes:
+    project_index = _get_project_index(Path('.').resolve())
+    directory_modification_times = _get_modification_times(project_index.directories)
+    file_modification_times = _get_modification_times(path for path, _ in project_index.paths if project_index.file_types[path])
+    return directory_modification_times, file_modification_times
+
+
+def _invalidate_changed_files(modification_times: Optional[ModificationTimes]) -> ModificationTimes:
+    # Forget what we have read from files that have changed since the last time, and everything if parsed files were added or removed.
+    if modification_times is None:
+        return _get_project_modification_times()
+    directory_modification_times, file_modification_times = modification_times
+    if _get_modification_times(directory_modification_times) != directory_modification_times:
+        _invalidate_project_index()
+    current_modification_times = _get_project_modification_times()
+    _, current_file_modification_times = current_modification_times
+    added_or_removed_paths = current_file_modification_times.keys() ^ file_modification_times.keys()
+    if any(_get_file_types(path) - {'all'} for path in added_or_removed_paths):
+        LOGGER.info('Files have been added or removed, forgetting all files')
+        _invalidate_caches()
+    else:
+        # Other files, such as images and our PDF outputs, can only affect the documents that reference them.
+        changed_paths = added_or_removed_paths | {
+            path for path, modification_time in current_file_modification_times.items()
+            if modification_time != file_modification_times.get(path)
+        }
+        if changed_paths:
+            LOGGER.info('Forgetting %d changed files', len(changed_paths))
+            _invalidate_caches(changed_paths)
+    return current_modification_times
+
+
+def _get_watched_paths(tex_input_paths: Iterable[Path]) -> Set[Path]:
+    tex_input_paths = list(tex_input_paths)
+    watched_paths = set(tex_input_paths)
+    watched_paths.update(_get_flat_references_from_tex_files(tex_input_paths))
+    watched_paths.update(_find_files(file_types=['eps', 'xlsx']))
+    return watched_paths
+
+
+def _wait_for_changes(modification_times: Dict[Path, Optional[int]], interval: float, debounce: float) -> Set[Path]:
+    while True:
+        sleep(interval)
+        current_modification_times = _get_modification_times(modification_times)
+        if current_modification_times != modification_times:
+            break
+    # Wait until the files stop changing, so that we do not compile half-saved files or compile once per saved file.
+    while True:
+        sleep(debounce)
+        latest_modification_times = _get_modification_times(modification_times)
+        if latest_modification_times == current_modification_times:
+            break
+        current_modification_times = latest_modification_times
+    return {path for path, modification_time in current_modification_times.items() if modification_time != modification_times[path]}
+
+
+def _watch_tex_files(
+    input_paths: Optional[Iterable[Path]],
+    build_directory: Optional[Path] = None,
+    jobs: Optional[int] = None,
+    max_memory: Optional[int] = None,
+    interval: float = 0.5,
+    debounce: float = 0.2,
+) -> None:
+    # Follow the references from TeX files and only recompile documents that are affected by changed files.
+    _link_root_directory(ROOT_COPY_DIRECTORY)
+    _invalidate_project_index()
+    if input_paths is None:
+        input_paths = _find_files(file_types=['tex'])
+    documents = {input_path.resolve(): input_path for input_path in input_paths}
+    if not documents:
+        return
+
+    _create_untracked_directory(CACHE_DIRECTORY)
+    substitution_directory = Path(mkdtemp(prefix='substitution-', dir=CACHE_DIRECTORY))
+    backups: Dict[Path, bytes] = dict()
+    os.environ['TEXINPUTS'] = f'{substitution_directory}:.:{ROOT_COPY_DIRECTORY}/template:'
+    os.environ[SUBSTITUTION_DIRECTORY_VARIABLE] = f'{substitution_directory}'
+    try:
+        format_path = _get_istqb_format()
+        if format_path is not None:
+            os.environ[FORMAT_VARIABLE] = f'{format_path}'
+
+        changed_paths: Optional[Set[Path]] = None  # at first, all documents are affected
+        project_modification_times: Optional[ModificationTimes] = None
+        while True:
+            project_modification_times = _invalidate_changed_files(project_modification_times)
+            modification_times = _get_modification_times(_get_watched_paths(documents))
             try:
-                shutil.rmtree(ROOT_COPY_DIRECTORY)
-            except FileNotFoundError:
-                pass
+                _validate_files(file_types=['all'], silent=True)
+                _fixup_line_endings()
+                _convert_eps_files_to_pdf(jobs)
+                _convert_xlsx_files_to_pdf(jobs, max_memory)
+                variable_replacements = _get_variable_replacements_for_many_tex_files(documents)
+            except (ValueError, CalledProcessError) as e:
+                LOGGER.error('%s', e)
+                pending_paths = changed_paths  # retry the affected documents after the next change
+            else:
+                pending_paths = set()
+                if changed_paths is None or any(_get_file_types(path) & {'eps', 'xlsx'} for path in changed_paths):
+                    affected_documents = set(documents)
+                    resubstituted_documents = affected_documents
+                else:
+                    affected_documents = _get_affected_tex_files(changed_paths) & documents.keys()
+                    resubstituted_documents = _get_affected_tex_files(
+                        path for path in changed_paths if 'markdown' not in _get_file_types(path)
+                    )
 
+                with _trace('Substitute variables'):
+                    substituted_directories = set()
+                    for input_path, tex_input_path in variable_replacements.items():
+                        if changed_paths is not None and input_path not in changed_paths:
+                            if tex_input_path not in resubstituted_documents:
+                                continue
+                            if input_path in backups:
+                                with input_path.open('wb') as f:
+                                    f.write(backups.pop(input_path))
+                        _substitute_variables_in_file(input_path, tex_input_path, substitution_directory, backups)
+                        substituted_directories.add(input_path.parent)
+                    _substitute_variables_in_questions(
+                        (input_path for input_path in variable_replacements if input_path.parent in substituted_directories),
+                        substitution_directory, backups,
+                    )
 
-def _compile_tex_files_to_pdf(previous_continuous: bool, input_paths: Optional[Iterable[Path]], full_compile: bool) -> None:
-    _compile_tex_files(_compile_tex_file_to_pdf, previous_continuous, input_paths=input_paths, full_compile=full_compile)
+                if affected_documents:
+                    LOGGER.info('Recompiling %d out of %d documents', len(affected_documents), len(documents))
+                    affected_input_paths = [documents[tex_input_path] for tex_input_path in sorted(affected_documents)]
+                    _run_compilations(_compile_tex_file_to_pdf, affected_input_paths, (build_directory,), dict(), jobs, max_memory)
+
+            # Do not react to the files that we have just written ourselves but do react to files that authors changed in the meantime.
+            watched_paths = _get_watched_paths(documents)
+            current_modification_times = _get_modification_times(watched_paths)
+            for path in watched_paths:
+                if path in modification_times and not QUESTIONS_YAML_REGEXP.fullmatch(path.name) and path not in backups:
+                    current_modification_times[path] = modification_times[path]
+            LOGGER.info('Watching %d files for changes', len(watched_paths))
+            newly_changed_paths = _wait_for_changes(current_modification_times, interval, debounce)
+            for path in sorted(newly_changed_paths):
+                LOGGER.info('File "%s" has changed', path)
+            changed_paths = None if pending_paths is None else pending_paths | newly_changed_paths
+    except KeyboardInterrupt:
+        pass
+    finally:
+        _restore_backups(backups)
+        shutil.rmtree(substitution_directory, ignore_errors=True)
+        del os.environ['TEXINPUTS']
+        del os.environ[SUBSTITUTION_DIRECTORY_VARIABLE]
+        os.environ.pop(FORMAT_VARIABLE, None)
+        _invalidate_project_index()
+
+
+def _handle_server_request(parser: ArgumentParser, request_line: bytes) -> Dict[str, Any]:
+    from logging.handlers import BufferingHandler
+    log_handler = BufferingHandler(sys.maxsize)
+    logging.getLogger().addHandler(log_handler)
+    output = StringIO()
+    reply: Dict[str, Any] = {'status': 0}
+    try:
+        with redirect_stdout(output), redirect_stderr(output):
+            request = json.loads(request_line)
+            command = SERVER_COMMAND_ALIASES.get(request['command'], request['command'])
+            if command not in SERVER_COMMANDS:
+                raise ValueError(f'Unknown command: {command}')
+            args = parser.parse_args([command, *request.get('arguments', [])])
+            if getattr(args, 'previous_continuous', False):
+                raise ValueError('Continuous compilation is not supported by the server, use the watch command instead')
+            _run_arguments(parser, args)
+    except SystemExit as e:
+        reply['status'] = e.code if isinstance(e.code, int) else int(e.code is not None)
+    except Exception as e:
+        reply['status'] = 1
+        reply['error'] = f'{e}'
+    finally:
+        logging.getLogger().removeHandler(log_handler)
+    reply['output'] = output.getvalue()
+    reply['log'] = [{'level': record.levelname, 'message': record.getMessage()} for record in log_handler.buffer]
+    return reply
+
+
+def _serve(socket_path: Path) -> None:
+    import socket
+    parser = _get_argument_parser()
+    with _trace('Warm up'):
+        modification_times = _invalidate_changed_files(None)
+        _get_project_index(Path('.').resolve()).get_dependents()
+    if socket_path.parent == CACHE_DIRECTORY:
+        _create_untracked_directory(CACHE_DIRECTORY)
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    socket_path.unlink(missing_ok=True)  # left behind by a server that has been killed
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server_socket:
+        server_socket.bind(f'{socket_path}')
+        server_socket.listen()
+        LOGGER.info('Waiting for commands on socket "%s"', socket_path)
+        try:
+            while True:
+                connection, _ = server_socket.accept()
+                try:
+                    with connection, connection.makefile('rwb') as stream:
+                        for request_line in stream:
+                            start_time = perf_counter()
+                            for cached_fn in (_warning, _changed_paths, _get_current_repository):
+                                cached_fn.cache_clear()
+                            modification_times = _invalidate_changed_files(modification_times)
+                            reply = _handle_server_request(parser, request_line)
+                            stream.write(json.dumps(reply).encode() + b'\n')
+                            stream.flush()
+                            LOGGER.info('Replied with exit status %d in %.3f seconds', reply['status'], perf_counter() - start_time)
+                except OSError as e:
+                    LOGGER.warning('Lost connection to a client: %s', e)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            socket_path.unlink(missing_ok=True)
 
 
-def _compile_tex_files_to_html(output_directory: Path, input_paths: Optional[Iterable[Path]], full_compile: bool) -> None:
+def _compile_tex_files_to_html(
+    output_directory: Path,
+    input_paths: Optional[Iterable[Path]],
+    full_compile: bool,
+    jobs: Optional[int] = None,
+    max_memory: Optional[int] = None,
+    since: str = DEFAULT_BASE_REVISION,
+    working_tree: bool = False,
+) -> None:
     output_directory.mkdir(parents=True, exist_ok=True)
-    _compile_tex_files(_compile_tex_file_to_html, output_directory, input_paths=input_paths, full_compile=full_compile)
+    _compile_tex_files(
+        _compile_tex_file_to_html, output_directory, input_paths=input_paths, full_compile=full_compile, since=since,
+        working_tree=working_tree, jobs=jobs, max_memory=max_memory,
+    )
 
 
-def _compile_tex_files_to_epub(output_directory: Path, input_paths: Optional[Iterable[Path]], full_compile: bool) -> None:
+def _compile_tex_files_to_epub(
+    output_directory: Path,
+    input_paths: Optional[Iterable[Path]],
+    full_compile: bool,
+    jobs: Optional[int] = None,
+    max_memory: Optional[int] = None,
+    since: str = DEFAULT_BASE_REVISION,
+    working_tree: bool = False,
+) -> None:
     output_directory.mkdir(parents=True, exist_ok=True)
-    _compile_tex_files(_compile_tex_file_to_epub, output_directory, input_paths=input_paths, full_compile=full_compile)
+    _compile_tex_files(
+        _compile_tex_file_to_epub, output_directory, input_paths=input_paths, full_compile=full_compile, since=since,
+        working_tree=working_tree, jobs=jobs, max_memory=max_memory,
+    )
 
 
-def _compile_tex_files_to_docx(output_directory: Path, input_paths: Optional[Iterable[Path]], full_compile: bool) -> None:
+def _compile_tex_files_to_docx(
+    output_directory: Path,
+    input_paths: Optional[Iterable[Path]],
+    full_compile: bool,
+    jobs: Optional[int] = None,
+    max_memory: Optional[int] = None,
+    since: str = DEFAULT_BASE_REVISION,
+    working_tree: bool = False,
+) -> None:
     output_directory.mkdir(parents=True, exist_ok=True)
-    _compile_tex_files(_compile_tex_file_to_docx, output_directory, input_paths=input_paths, full_compile=full_compile)
+    _compile_tex_files(
+        _compile_tex_file_to_docx, output_directory, input_paths=input_paths, full_compile=full_compile, since=since,
+        working_tree=working_tree, jobs=jobs, max_memory=max_memory,
+    )
 
 
-def _compile_tex_files_to_md(output_directory: Path, input_paths: Optional[Iterable[Path]], full_compile: bool) -> None:
+def _compile_tex_files_to_md(
+    output_directory: Path,
+    input_paths: Optional[Iterable[Path]],
+    full_compile: bool,
+    jobs: Optional[int] = None,
+    max_memory: Optional[int] = None,
+    since: str = DEFAULT_BASE_REVISION,
+    working_tree: bool = False,
+) -> None:
     output_directory.mkdir(parents=True, exist_ok=True)
-    _compile_tex_files(_compile_tex_file_to_md, output_directory, input_paths=input_paths, full_compile=full_compile)
+    _compile_tex_files(
+        _compile_tex_file_to_md, output_directory, input_paths=input_paths, full_compile=full_compile, since=since,
+        working_tree=working_tree, jobs=jobs, max_memory=max_memory,
+    )
 
 
 def find_files(args: Namespace) -> None:
@@ -1656,6 +3030,12 @@ def find_files(args: Namespace) -> None:
         print(path)
 
 
+def affected_documents(args: Namespace) -> None:
+    paths = list(map(Path, args.filenames)) if args.filenames else _changed_paths(args.since, args.working_tree)
+    for path in sorted(_get_affected_tex_files(paths)):
+        print(path)
+
+
 def fixup_languages(args: Namespace) -> None:
     _fixup_languages()
 
@@ -1665,19 +3045,19 @@ def fixup_line_endings(args: Namespace) -> None:
 
 
 def validate_files(args: Namespace) -> None:
-    _validate_files(file_types=[args.filetype])
+    _validate_files(file_types=[args.filetype], use_cache=not args.no_cache, jobs=args.jobs)
 
 
 def convert_eps_files_to_pdf(args: Namespace) -> None:
-    _convert_eps_files_to_pdf()
+    _convert_eps_files_to_pdf(args.jobs)
 
 
 def convert_xlsx_files_to_pdf(args: Namespace) -> None:
-    _convert_xlsx_files_to_pdf()
+    _convert_xlsx_files_to_pdf(args.jobs, args.max_memory)
 
 
 def convert_md_questions_to_yaml(args: Namespace) -> None:
-    _convert_md_questions_to_yaml()
+    _convert_md_questions_to_yaml(args.jobs)
 
 
 def convert_yaml_questions_to_md(args: Namespace) -> None:
@@ -1686,30 +3066,66 @@ def convert_yaml_questions_to_md(args: Namespace) -> None:
 
 def compile_tex_files_to_pdf(args: Namespace) -> None:
     input_paths = sorted(map(Path, args.filenames)) if args.filenames else None
-    _compile_tex_files_to_pdf(args.previous_continuous, input_paths, args.full_compile)
+    build_directory = Path(args.build_dir) if args.build_dir is not None else None
+    _compile_tex_files_to_pdf(
+        args.previous_continuous, input_paths, args.full_compile, build_directory, args.jobs, args.max_memory, args.since,
+        args.working_tree,
+    )
+
+
+def watch_tex_files(args: Namespace) -> None:
+    input_paths = sorted(map(Path, args.filenames)) if args.filenames else None
+    build_directory = Path(args.build_dir) if args.build_dir is not None else None
+    _watch_tex_files(input_paths, build_directory, args.jobs, args.max_memory, args.interval, args.debounce)
 
 
 def compile_tex_files_to_html(args: Namespace) -> None:
     input_paths = sorted(map(Path, args.filenames)) if args.filenames else None
-    _compile_tex_files_to_html(Path(args.outputdir), input_paths, args.full_compile)
+    _compile_tex_files_to_html(
+        Path(args.outputdir), input_paths, args.full_compile, args.jobs, args.max_memory, args.since, args.working_tree,
+    )
 
 
 def compile_tex_files_to_epub(args: Namespace) -> None:
     input_paths = sorted(map(Path, args.filenames)) if args.filenames else None
-    _compile_tex_files_to_epub(Path(args.outputdir), input_paths, args.full_compile)
+    _compile_tex_files_to_epub(
+        Path(args.outputdir), input_paths, args.full_compile, args.jobs, args.max_memory, args.since, args.working_tree,
+    )
 
 
 def compile_tex_files_to_docx(args: Namespace) -> None:
     input_paths = sorted(map(Path, args.filenames)) if args.filenames else None
-    _compile_tex_files_to_docx(Path(args.outputdir), input_paths, args.full_compile)
+    _compile_tex_files_to_docx(
+        Path(args.outputdir), input_paths, args.full_compile, args.jobs, args.max_memory, args.since, args.working_tree,
+    )
 
 
 def compile_tex_files_to_md(args: Namespace) -> None:
     input_paths = sorted(map(Path, args.filenames)) if args.filenames else None
-    _compile_tex_files_to_md(Path(args.outputdir), input_paths, args.full_compile)
+    _compile_tex_files_to_md(
+        Path(args.outputdir), input_paths, args.full_compile, args.jobs, args.max_memory, args.since, args.working_tree,
+    )
 
 
-def main():
+def serve(args: Namespace) -> None:
+    _serve(Path(args.socket))
+
+
+def _run_with_profile_trace(fn: Callable[[Namespace], None], args: Namespace, output_path: Path) -> None:
+    with NamedTemporaryFile('wt', prefix='istqb-trace-', suffix='.jsonl', delete=False) as f:
+        events_path = Path(f.name)
+    os.environ[PROFILE_TRACE_VARIABLE] = f'{events_path}'
+    try:
+        with _trace(fn.__name__.replace('_', '-'), category='command'):
+            fn(args)
+    finally:
+        del os.environ[PROFILE_TRACE_VARIABLE]
+        _write_profile_trace(events_path, output_path)
+        events_path.unlink()
+        LOGGER.info('Wrote a profile trace to "%s"', output_path)
+
+
+def _get_argument_parser() -> ArgumentParser:
     parser = ArgumentParser(
         prog='template.py',
         description='Process ISTQB documents written with the LaTeX+Markdown template',
@@ -1717,59 +3133,113 @@ def main():
     )
     subparsers = parser.add_subparsers()
 
+    parser_common = ArgumentParser(add_help=False)
+    parser_common.add_argument(
+        '--profile-trace',
+        help='Write a trace of the run in the Chrome trace event format to this file',
+    )
+
+    parser_changes = ArgumentParser(add_help=False)
+    parser_changes.add_argument(
+        '--since',
+        default=DEFAULT_BASE_REVISION,
+        help=f'Consider files changed since the merge base of this revision and HEAD; defaults to {DEFAULT_BASE_REVISION}',
+    )
+    parser_changes.add_argument(
+        '--working-tree',
+        action='store_true',
+        help='Consider also staged, unstaged, and untracked changes in the working tree',
+    )
+
     parser_find_files = subparsers.add_parser(
         'find-files',
+        parents=[parser_common],
         help='Produce a newline-separated list of different types of files in this repository',
     )
     parser_find_files.add_argument('filetype', choices=FILETYPES)
     parser_find_files.add_argument('-f', '--from', help='a TeX document in which the files should be used')
     parser_find_files.set_defaults(func=find_files)
 
+    parser_affected_documents = subparsers.add_parser(
+        'affected-documents',
+        parents=[parser_common, parser_changes],
+        help='Produce a newline-separated list of TeX files that depend on the given files or on files changed in this branch',
+    )
+    parser_affected_documents.add_argument('filenames', nargs='*')
+    parser_affected_documents.set_defaults(func=affected_documents)
+
     parser_fixup_languages = subparsers.add_parser(
         'fixup-languages',
+        parents=[parser_common],
         help='Determine and add `babel-language` to language definitions if missing',
     )
     parser_fixup_languages.set_defaults(func=fixup_languages)
 
     parser_fixup_line_endings = subparsers.add_parser(
         'fixup-line-endings',
+        parents=[parser_common],
         help='Convert all text files to Unix-style line endings',
     )
     parser_fixup_line_endings.set_defaults(func=fixup_line_endings)
 
+    parser_jobs = ArgumentParser(add_help=False)
+    parser_jobs.add_argument(
+        '-j', '--jobs',
+        type=int,
+        help='The number of jobs that should run in parallel; defaults to the number of available CPUs',
+    )
+
+    parser_parallel = ArgumentParser(add_help=False, parents=[parser_jobs])
+    parser_parallel.add_argument(
+        '--max-memory',
+        type=_parse_memory_size,
+        help='Only run as many jobs in parallel as fit into this amount of memory, such as 4G; defaults to the container memory limit',
+    )
+
     parser_validate_files = subparsers.add_parser(
         'validate-files',
+        parents=[parser_common, parser_jobs],
         help='Validate the different types of files in this repository',
     )
     parser_validate_files.add_argument('filetype', choices=VALIDATABLE_FILETYPES)
+    parser_validate_files.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Validate all files, including files whose inputs have not changed since they were last validated',
+    )
     parser_validate_files.set_defaults(func=validate_files)
 
     parser_convert_eps_files_to_pdf = subparsers.add_parser(
         'convert-eps-to-pdf',
+        parents=[parser_common, parser_jobs],
         help='Convert all EPS files in this repository to PDF',
     )
     parser_convert_eps_files_to_pdf.set_defaults(func=convert_eps_files_to_pdf)
 
     parser_convert_xlsx_files_to_pdf = subparsers.add_parser(
         'convert-xlsx-to-pdf',
+        parents=[parser_common, parser_parallel],
         help='Convert all XLSX files in this repository to PDF',
     )
     parser_convert_xlsx_files_to_pdf.set_defaults(func=convert_xlsx_files_to_pdf)
 
     parser_convert_md_questions_to_yaml = subparsers.add_parser(
         'convert-md-questions-to-yaml',
+        parents=[parser_common, parser_jobs],
         help='Convert all MD files with questions definitions to YAML',
     )
     parser_convert_md_questions_to_yaml.set_defaults(func=convert_md_questions_to_yaml)
 
     parser_convert_yaml_questions_to_md = subparsers.add_parser(
         'convert-yaml-questions-to-md',
+        parents=[parser_common],
         help='Convert all YAML files with questions definitions to MD',
     )
     parser_convert_yaml_questions_to_md.set_defaults(func=convert_yaml_questions_to_md)
 
     parser_compile_tex_to_pdf = subparsers.add_parser(
         'compile-tex-to-pdf',
+        parents=[parser_common, parser_changes, parser_parallel],
         help='Compile all TeX files in this repository to PDF',
     )
     parser_compile_tex_to_pdf.add_argument(
@@ -1782,11 +3252,40 @@ def main():
         action='store_true',
         help='Compile all TeX files, including files that have not changed in this branch',
     )
+    parser_compile_tex_to_pdf.add_argument(
+        '--build-dir',
+        help='Keep auxiliary files of every TeX file in a subdirectory of this directory, so that they can be reused by later compilations',
+    )
     parser_compile_tex_to_pdf.add_argument('filenames', nargs='*')
     parser_compile_tex_to_pdf.set_defaults(func=compile_tex_files_to_pdf)
 
+    parser_watch = subparsers.add_parser(
+        'watch',
+        parents=[parser_common, parser_parallel],
+        help='Keep validating and recompiling the TeX files to PDF as they or the files that they reference change',
+    )
+    parser_watch.add_argument(
+        '--build-dir',
+        help='Keep auxiliary files of every TeX file in a subdirectory of this directory, so that they can be reused by later compilations',
+    )
+    parser_watch.add_argument(
+        '--interval',
+        type=float,
+        default=0.5,
+        help='How often, in seconds, the files should be checked for changes',
+    )
+    parser_watch.add_argument(
+        '--debounce',
+        type=float,
+        default=0.2,
+        help='How long, in seconds, the files should stay unchanged before the documents are recompiled',
+    )
+    parser_watch.add_argument('filenames', nargs='*')
+    parser_watch.set_defaults(func=watch_tex_files)
+
     parser_compile_tex_to_html = subparsers.add_parser(
         'compile-tex-to-html',
+        parents=[parser_common, parser_changes, parser_parallel],
         help='Compile all TeX files in this repository to HTML',
     )
     parser_compile_tex_to_html.add_argument(
@@ -1800,6 +3299,7 @@ def main():
 
     parser_compile_tex_to_epub = subparsers.add_parser(
         'compile-tex-to-epub',
+        parents=[parser_common, parser_changes, parser_parallel],
         help='Compile all TeX files in this repository to EPUB',
     )
     parser_compile_tex_to_epub.add_argument(
@@ -1813,6 +3313,7 @@ def main():
 
     parser_compile_tex_files_to_docx = subparsers.add_parser(
         'compile-tex-to-docx',
+        parents=[parser_common, parser_changes, parser_parallel],
         help='Compile all TeX files in this repository to DOCX',
     )
     parser_compile_tex_files_to_docx.add_argument(
@@ -1826,6 +3327,7 @@ def main():
 
     parser_compile_tex_files_to_md = subparsers.add_parser(
         'compile-tex-to-md',
+        parents=[parser_common, parser_changes, parser_parallel],
         help='Compile selected TeX files in this repository to a combined MD file',
     )
     parser_compile_tex_files_to_md.add_argument(
@@ -1837,13 +3339,36 @@ def main():
     parser_compile_tex_files_to_md.add_argument('filenames', nargs='*')
     parser_compile_tex_files_to_md.set_defaults(func=compile_tex_files_to_md)
 
-    args = parser.parse_args()
+    parser_serve = subparsers.add_parser(
+        'serve',
+        parents=[parser_common],
+        help='Keep the files in this repository indexed and parsed, and run commands sent over a UNIX socket',
+    )
+    parser_serve.add_argument(
+        '--socket',
+        default=f'{SERVER_SOCKET}',
+        help=f'The UNIX socket on which commands are received; defaults to {SERVER_SOCKET.relative_to(CURRENT_DIRECTORY)}',
+    )
+    parser_serve.set_defaults(func=serve)
+
+    return parser
+
+
+def _run_arguments(parser: ArgumentParser, args: Namespace) -> None:
     if 'func' not in args:
         parser.print_help()
+    elif args.profile_trace is not None:
+        _run_with_profile_trace(args.func, args, Path(args.profile_trace))
     else:
         args.func(args)
 
 
+def main():
+    parser = _get_argument_parser()
+    args = parser.parse_args()
+    _run_arguments(parser, args)
+
+
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO, format='%(asctime)s\t[%(levelname)s]\t%(message)s')
     main()
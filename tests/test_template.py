@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+from pathlib import Path
+import shutil
+from typing import Optional
+
+import pytest
+import yaml
+
+import template
+
+
+METADATA = '''\
+organization: ISTQB®
+schema: Certified Tester
+level: Foundation Level
+title: Example Document
+prefix: EXMPL
+code: CT-EXMPL
+type: Sample Exam – Questions
+version: v0.1
+date: 2024/06/04
+release: For internal use only
+language: en
+'''
+
+QUESTIONS = '''\
+# metadata
+lo: FL-1.1.1
+k-level: K1
+points: 1
+correct: a
+
+## question
+What is ${metadata.code}?
+
+## answers
+a) ${metadata.code}
+b) Something else
+
+## justification
+a) Correct, ${metadata.code} is the code of this document
+b) Wrong
+'''
+
+SAMPLE_EXAM = '''\
+\\documentclass{istqb}
+\\usepackage{markdown}
+\\markdownInput[snippet=metadata]{metadata.yml}
+\\begin{document}
+\\markdownInput{questions/questions.yml}
+\\end{document}
+'''
+
+SYLLABUS = '''\
+\\documentclass{istqb}
+\\usepackage{markdown}
+\\markdownInput[snippet=metadata]{metadata.yml}
+\\begin{document}
+\\markdownInput{chapter.md}
+\\end{document}
+'''
+
+CHAPTER = '''\
+Introduction {#intro}
+============
+
+This chapter is never referenced.
+'''
+
+
+def _copy_questions_yaml_found_by_tex(input_path: Path, output_directory: Path) -> Optional[Path]:
+    for directory in os.environ['TEXINPUTS'].split(':'):
+        questions_path = Path(directory) / 'questions' / 'questions.yml'
+        if directory and questions_path.exists():
+            output_path = output_directory / f'{input_path.stem}.yml'
+            shutil.copyfile(questions_path, output_path)
+            return output_path
+    return None
+
+
+@pytest.fixture
+def repository(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    # Move the paths that template.py derived from the current directory at import time to the repository.
+    current_directory = template.CURRENT_DIRECTORY
+    monkeypatch.chdir(tmp_path)
+    for name in ('CURRENT_DIRECTORY', 'ROOT_COPY_DIRECTORY', 'EXAMPLE_DOCUMENT', 'CACHE_DIRECTORY', 'VALIDATION_CACHE',
+                 'BUILD_HISTORY', 'EPS_MANIFEST', 'XLSX_MANIFEST', 'QUESTIONS_CACHE', 'SERVER_SOCKET', 'FORMAT_DIRECTORY'):
+        monkeypatch.setattr(template, name, tmp_path / getattr(template, name).relative_to(current_directory))
+    template._invalidate_caches()
+    (tmp_path / 'metadata.yml').write_text(METADATA)
+    (tmp_path / 'questions').mkdir()
+    (tmp_path / 'questions' / 'questions.md').write_text(QUESTIONS)
+    (tmp_path / 'sample-exam.tex').write_text(SAMPLE_EXAM)
+    yield tmp_path
+    template._invalidate_caches()
+
+
+@pytest.mark.skipif(shutil.which('texlua') is None, reason='requires TeX Live')
+def test_sample_exam_questions_have_substituted_variables(repository: Path) -> None:
+    output_directory = repository / 'output'
+    output_directory.mkdir()
+    template._compile_tex_files(
+        _copy_questions_yaml_found_by_tex, output_directory, input_paths=[repository / 'sample-exam.tex'], jobs=1,
+    )
+
+    with (output_directory / 'sample-exam.yml').open('rt') as f:
+        questions_text = f.read()
+    assert '${' not in questions_text
+    question = yaml.safe_load(questions_text)['questions'][1]
+    assert question['question'] == 'What is CT-EXMPL?\n'
+    assert question['answers']['a'] == 'CT-EXMPL'
+
+    # The sources of the questions are left untouched.
+    assert '${metadata.code}' in (repository / 'questions' / 'questions.md').read_text()
+
+
+def test_cached_validation_repeats_unused_identifier_warnings(repository: Path, caplog: pytest.LogCaptureFixture) -> None:
+    (repository / 'syllabus.tex').write_text(SYLLABUS)
+    (repository / 'chapter.md').write_text(CHAPTER)
+    caplog.set_level(logging.INFO, logger=template.LOGGER.name)
+
+    def get_unused_identifier_warnings() -> list:
+        warnings = [record.getMessage() for record in caplog.records if 'is unused' in record.getMessage()]
+        caplog.clear()
+        return warnings
+
+    template._validate_files(['markdown'], jobs=1)
+    warnings = get_unused_identifier_warnings()
+    assert len(warnings) == 1 and 'section:intro' in warnings[0]
+
+    template._warning.cache_clear()  # every warning is only shown once per process
+    template._validate_files(['markdown'], jobs=1)
+    assert 'Skipped 3 unchanged inputs and validated 0 changed inputs' in caplog.text
+    assert get_unused_identifier_warnings() == warnings